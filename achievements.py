@@ -0,0 +1,146 @@
+"""
+Declarative achievement rules, evaluated incrementally when a quiz finishes.
+
+A rule is data: a name, a description and a measure compared against a
+threshold, optionally for one quiz type:
+
+    quizzes        quizzes finished (all types, or one type)
+    total_points   points collected
+    best           best score
+    score          points of the quiz just finished
+    perfect        1 when the quiz just finished was answered entirely correctly
+    day_streak     consecutive days with at least one quiz
+    score_streak   consecutive quizzes scoring at least min_points
+
+Nothing is recomputed from results: quizzes/total_points/best come from the
+user_stats and user_type_stats rows the results triggers already maintain,
+and the streak counters live in achievement_progress, advanced by one step
+per finished quiz. Evaluating a completion therefore costs a handful of
+primary-key lookups whatever the history or the number of rules. Streaks
+count from the first quiz recorded through evaluate(); bulk-imported results
+do not advance them.
+"""
+from datetime import date as Date, datetime
+
+MEASURES = ('quizzes', 'total_points', 'best', 'score', 'perfect', 'day_streak', 'score_streak')
+
+
+class Rule:
+    def __init__(self, name, description, measure, threshold, quiz_type=None, min_points=None):
+        if measure not in MEASURES:
+            raise ValueError(f"unknown achievement measure: {measure} (available: {', '.join(MEASURES)})")
+        if measure == 'score_streak' and min_points is None:
+            raise ValueError("score_streak rules need min_points")
+        self.name = name
+        self.description = description
+        self.measure = measure
+        self.threshold = threshold
+        self.quiz_type = quiz_type
+        self.min_points = min_points
+        # achievement_progress counter the rule reads; None for stateless rules
+        if measure == 'day_streak':
+            self.progress_key = 'day_streak'
+        elif measure == 'score_streak':
+            self.progress_key = f"score_streak:{quiz_type or '*'}:{min_points}"
+        else:
+            self.progress_key = None
+
+
+RULES = [
+    Rule("First Steps", "Finished your first quiz", 'quizzes', 1),
+    Rule("Dedicated Learner", "Finished 10 quizzes", 'quizzes', 10),
+    Rule("Quiz Veteran", "Finished 100 quizzes", 'quizzes', 100),
+    Rule("Point Collector", "Collected 100 points", 'total_points', 100),
+    Rule("Point Hoarder", "Collected 1000 points", 'total_points', 1000),
+    Rule("High Scorer", "Scored 10 points or more in one quiz", 'score', 10),
+    Rule("Flawless", "Answered every question of a quiz correctly", 'perfect', 1),
+    Rule("Three in a Row", "Played on 3 consecutive days", 'day_streak', 3),
+    Rule("Weekly Habit", "Played on 7 consecutive days", 'day_streak', 7),
+    Rule("On a Roll", "Scored 10 or more in 3 quizzes in a row", 'score_streak', 3, min_points=10),
+    Rule("Single Choice Specialist", "Finished 10 single choice quizzes", 'quizzes', 10, quiz_type='single'),
+    Rule("Multiple Choice Specialist", "Finished 10 multiple choice quizzes", 'quizzes', 10, quiz_type='multiple'),
+    Rule("Open Thinker", "Finished 10 open question quizzes", 'quizzes', 10, quiz_type='open'),
+    Rule("Open Master", "Scored 12 or more in an open question quiz", 'best', 12, quiz_type='open'),
+]
+
+
+def _advance(rule, counter, quiz_type, points, day):
+    """ The (value, marker) of rule's streak counter after one finished quiz, or None if it is unaffected """
+    value, marker = counter
+    if rule.measure == 'day_streak':
+        if marker == day:
+            return None
+        previous = Date.fromisoformat(marker).toordinal() if marker else None
+        return (value + 1 if previous == Date.fromisoformat(day).toordinal() - 1 else 1), day
+    if rule.quiz_type not in (None, quiz_type):
+        return None
+    return (value + 1 if points >= rule.min_points else 0), marker
+
+
+class AchievementEngine:
+    def __init__(self, rules=RULES):
+        names = [rule.name for rule in rules]
+        if len(set(names)) != len(names):
+            raise ValueError("achievement rule names must be unique")
+        self.rules = list(rules)
+        self.stateful = [rule for rule in self.rules if rule.progress_key]
+
+    def evaluate(self, conn, user_id, quiz_type, points, date=None, total=None):
+        """ Update the rule state for a quiz just recorded in results and grant what it earned.
+
+        Call inside the transaction that inserted the result (after the
+        insert, so the aggregates include it); nothing is committed here.
+        total is the quiz's number of questions; without it no quiz counts
+        as perfect. Returns [(name, description)] of the newly granted
+        achievements.
+        """
+        date = date or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        day = date[:10]
+        granted = {name for name, in conn.execute("SELECT name FROM achievements WHERE user_id=?", (user_id,))}
+        pending = [rule for rule in self.rules if rule.name not in granted and rule.quiz_type in (None, quiz_type)]
+        progress = {}
+        if self.stateful:
+            progress = {key: (value, marker) for key, value, marker in conn.execute(
+                "SELECT key, value, marker FROM achievement_progress WHERE user_id=?", (user_id,))}
+            # Streaks advance even once their own achievement is granted: other rules may share the counter
+            changed = {}
+            for rule in self.stateful:
+                key = rule.progress_key
+                if key not in changed:
+                    step = _advance(rule, progress.get(key, (0, None)), quiz_type, points, day)
+                    if step is not None:
+                        changed[key] = step
+            progress.update(changed)
+            conn.executemany(
+                "INSERT INTO achievement_progress (user_id, key, value, marker) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id, key) DO UPDATE SET value=excluded.value, marker=excluded.marker",
+                [(user_id, key, value, marker) for key, (value, marker) in changed.items()])
+        if not pending:
+            return []
+        stats = {None: conn.execute("SELECT quizzes, total_points, best FROM user_stats WHERE user_id=?", (user_id,)).fetchone() or (0, 0, 0)}
+        if any(rule.quiz_type for rule in pending):
+            stats[quiz_type] = conn.execute("SELECT quizzes, total_points, best FROM user_type_stats WHERE user_id=? AND type=?",
+                                            (user_id, quiz_type)).fetchone() or (0, 0, 0)
+        earned = []
+        for rule in pending:
+            if rule.measure == 'score':
+                value = points
+            elif rule.measure == 'perfect':
+                value = int(bool(total) and points == total)
+            elif rule.progress_key:
+                value = progress.get(rule.progress_key, (0, None))[0]
+            else:
+                value = stats[rule.quiz_type][('quizzes', 'total_points', 'best').index(rule.measure)]
+            if value >= rule.threshold:
+                earned.append((rule.name, rule.description))
+        conn.executemany("INSERT OR IGNORE INTO achievements (user_id, name, description, date) VALUES (?, ?, ?, ?)",
+                         [(user_id, name, description, date) for name, description in earned])
+        return earned
+
+
+ENGINE = AchievementEngine()
+
+
+def evaluate(conn, user_id, quiz_type, points, date=None, total=None):
+    """ evaluate() of the default engine (RULES) """
+    return ENGINE.evaluate(conn, user_id, quiz_type, points, date, total)
@@ -0,0 +1,125 @@
+"""
+Offline batch grading of submission dumps.
+
+Input is JSONL, one submission per line:
+
+    {"user": "alice", "question_id": "open-004", "answer": "..."}
+
+question_id is a question's stable id (questions.uid) or its numeric id.
+Lines are graded in chunks across a ProcessPoolExecutor with the same rules
+as the quiz (grading.grade). Verdicts are streamed back out in input order
+as JSONL and per-user totals are accumulated on the way; at most a few
+chunks are in flight, so memory stays bounded whatever the input size.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import database
+from grading import grade
+from question_bank import QUESTIONS_WITH_OPTIONS, rows_to_questions
+
+CHUNK_SIZE = 2000
+
+_bank = None
+_uids = None
+
+
+def load_bank(conn):
+    """ Return ({id: question}, {uid: id}) for the whole question bank """
+    bank = {q['id']: q for q in rows_to_questions(conn.execute(QUESTIONS_WITH_OPTIONS + " ORDER BY q.id, o.ordinal"))}
+    uids = dict(conn.execute("SELECT uid, id FROM questions WHERE uid IS NOT NULL"))
+    return bank, uids
+
+
+def _init_worker(db_file):
+    # Forked workers start without the parent's connections (see database._after_fork) and open their own
+    global _bank, _uids
+    database.DB_FILE = db_file
+    _bank, _uids = load_bank(database.get_connection())
+    database.close_connection()
+
+
+def _lookup(question_id):
+    if isinstance(question_id, int):
+        return _bank.get(question_id)
+    if isinstance(question_id, str):
+        if question_id in _uids:
+            return _bank.get(_uids[question_id])
+        if question_id.isdigit():
+            return _bank.get(int(question_id))
+    return None
+
+
+def grade_lines(lines):
+    """ Worker: grade a chunk of raw JSONL lines; returns one verdict dict per non-blank line """
+    verdicts = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            sub = json.loads(line)
+            user, question_id, answer = sub['user'], sub['question_id'], sub.get('answer')
+        except (ValueError, KeyError, TypeError) as e:
+            verdicts.append({'error': f"bad submission: {e}", 'line': line.strip()[:200]})
+            continue
+        q = _lookup(question_id)
+        if q is None:
+            verdicts.append({'user': user, 'question_id': question_id, 'error': "unknown question"})
+            continue
+        try:
+            result = grade(q, answer)
+        except Exception as e:
+            # One bad submission must not fail its whole chunk
+            verdicts.append({'user': user, 'question_id': question_id, 'error': f"cannot grade answer: {e}"})
+            continue
+        verdict = {'user': user, 'question_id': question_id, 'correct': result.correct}
+        if q['type'] == 'open':
+            verdict['matched'] = result.matched
+        verdicts.append(verdict)
+    return verdicts
+
+
+def _chunks(lines, size):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def grade_stream(lines, out, db_file=None, workers=None, chunk_size=CHUNK_SIZE):
+    """ Grade an iterable of JSONL lines, writing verdict lines to out.
+
+    Returns (count, totals): the number of verdicts written and per-user
+    totals {user: {'graded', 'correct', 'errors'}}.
+    """
+    workers = workers or os.cpu_count() or 1
+    totals = {}
+    count = 0
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(db_file or database.DB_FILE,)) as pool:
+        pending = []
+
+        def drain(limit):
+            nonlocal count
+            while len(pending) > limit:
+                for verdict in pending.pop(0).result():
+                    out.write(json.dumps(verdict) + '\n')
+                    count += 1
+                    if 'user' not in verdict:
+                        continue
+                    t = totals.setdefault(str(verdict['user']), {'graded': 0, 'correct': 0, 'errors': 0})
+                    if 'error' in verdict:
+                        t['errors'] += 1
+                    else:
+                        t['graded'] += 1
+                        t['correct'] += verdict['correct']
+
+        for chunk in _chunks(lines, chunk_size):
+            pending.append(pool.submit(grade_lines, chunk))
+            drain(workers * 2)
+        drain(0)
+    return count, totals
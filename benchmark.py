@@ -0,0 +1,782 @@
+"""
+Micro-benchmarks for the quiz backend.
+
+Usage:
+    python benchmark.py [name ...]
+
+Every benchmark runs against a throw-away database in a temporary directory,
+so the real knowledge_tests.db is never touched; the directories are removed
+when the benchmark finishes. Without arguments all benchmarks are run.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import database
+
+
+_temp_dirs = []
+
+
+def temp_dir():
+    """ A fresh temporary directory, removed by remove_temp_dirs() """
+    tmp = tempfile.mkdtemp(prefix="quiz_bench_")
+    _temp_dirs.append(tmp)
+    return tmp
+
+
+def remove_temp_dirs():
+    """ Close the shared connections, then delete every directory handed out by temp_dir() """
+    database.close_connection()
+    while _temp_dirs:
+        shutil.rmtree(_temp_dirs.pop(), ignore_errors=True)
+
+
+def use_temp_database():
+    """ Point the database module at a fresh file in a temporary directory """
+    database.close_connection()
+    database.DB_FILE = os.path.join(temp_dir(), "bench.db")
+    database.create_database()
+    return database.DB_FILE
+
+
+def timed(fn, repeat):
+    """ Run fn() repeat times and return the mean latency in microseconds """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def report(name, before, after):
+    print(f"{name:<40} before: {before:10.1f} us   after: {after:10.1f} us   speedup: {before / after:6.1f}x")
+
+
+def bench_connection(repeat=500):
+    """ Per-call latency of a User-style lookup: fresh connection + DDL vs the shared connection """
+    from user import User
+    use_temp_database()
+    User.register("bench", "bench@example.com", "secret")
+
+    def legacy():
+        # What every User method used to do: connect, re-run the DDL, query, close
+        conn = database.create_connection(database.DB_FILE)
+        for table in ("users", "achievements", "questions", "results"):
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY)")
+        conn.execute("SELECT * FROM users WHERE username=?", ("bench",)).fetchone()
+        conn.close()
+
+    before = timed(legacy, repeat)
+    after = timed(lambda: User.get_user("bench"), repeat)
+    report("User.get_user", before, after)
+
+
+def bench_user_session(users=20000, repeat=2000):
+    """ A typical session's per-user queries: username-to-id subqueries vs. the id carried by User """
+    from user import User
+    use_temp_database()
+    conn = database.get_connection()
+    with conn:
+        conn.executemany("INSERT INTO users (username, email, password) VALUES (?, ?, 'x')",
+                         ((f"student{i}", f"student{i}@example.com") for i in range(users)))
+    user = User.get_user(f"student{users // 2}")
+    for points in (3, 9, 14):
+        user.save_result('single', points)
+    user.grant_achievement("First Quiz", "Finished a quiz")
+    name = user.username
+    # Menu visits after login: stats, per-type stats, records, achievements, rank, two achievement checks
+    legacy_queries = [
+        ("SELECT quizzes, best, total_points, last_played FROM user_stats WHERE user_id=(SELECT id FROM users WHERE username=?)", (name,)),
+        ("SELECT type, quizzes, best, total_points FROM user_type_stats WHERE user_id=(SELECT id FROM users WHERE username=?)", (name,)),
+        ("SELECT type, points, date FROM results WHERE user_id=(SELECT id FROM users WHERE username=?) ORDER BY points DESC", (name,)),
+        ("SELECT name, description, date FROM achievements WHERE user_id=(SELECT id FROM users WHERE username=?)", (name,)),
+        ("SELECT total_points FROM leaderboard WHERE user_id=(SELECT id FROM users WHERE username=?)", (name,)),
+        ("SELECT 1 FROM achievements WHERE user_id=(SELECT id FROM users WHERE username=?) AND name=?", (name, "First Quiz")),
+        ("SELECT 1 FROM achievements WHERE user_id=(SELECT id FROM users WHERE username=?) AND name=?", (name, "Perfect Score")),
+    ]
+
+    # The same statements as User now issues them
+    id_queries = [(sql.replace("(SELECT id FROM users WHERE username=?)", "?"), (user.id,) + params[1:])
+                  for sql, params in legacy_queries]
+
+    def run(queries):
+        for sql, params in queries:
+            conn.execute(sql, params).fetchall()
+
+    assert [conn.execute(*q).fetchall() for q in legacy_queries] == [conn.execute(*q).fetchall() for q in id_queries]
+    # Best of several runs: the two forms are within run-to-run noise of each other
+    before = min(timed(lambda: run(legacy_queries), repeat) for _ in range(5))
+    after = min(timed(lambda: run(id_queries), repeat) for _ in range(5))
+    report(f"session queries ({users} users)", before, after)
+    print(f"  username lookups saved per session: {len(legacy_queries)} (User.__slots__: {', '.join(User.__slots__)})")
+    print("  the users index stays cached, so the lookups cost next to nothing: expect ~1.0x")
+
+
+def bench_migration(rows=1000000):
+    """ Rebuild of a pre-account results table (no user_id) with INSERT ... SELECT """
+    import sqlite3
+    database.close_connection()
+    database.DB_FILE = os.path.join(temp_dir(), "legacy.db")
+    conn = sqlite3.connect(database.DB_FILE)
+    conn.execute("CREATE TABLE results (id INTEGER PRIMARY KEY, type TEXT NOT NULL, points INTEGER NOT NULL, date TEXT NOT NULL)")
+    conn.executemany("INSERT INTO results (type, points, date) VALUES (?, ?, ?)",
+                     (("single", i % 20, "2024-01-01 12:00:00") for i in range(rows)))
+    conn.commit()
+    conn.close()
+    start = time.perf_counter()
+    database.create_database()
+    migrate = time.perf_counter() - start
+    database.close_connection()
+    start = time.perf_counter()
+    database.create_database()
+    noop = time.perf_counter() - start
+    print(f"migrate {rows} results rows: {migrate:.2f} s   startup when current: {noop * 1e3:.2f} ms")
+
+
+def synthetic_bank(count):
+    """ count question-bank entries spread evenly over the three types """
+    types = ('single', 'multiple', 'open')
+    bank = []
+    for i in range(count):
+        t = types[i % 3]
+        q = {'id': f"q{i}", 'type': t, 'question': f"Question {i}?"}
+        if t == 'open':
+            q['answer'] = f"Reference answer number {i} about routing protocols and packet forwarding"
+        elif t == 'single':
+            q['answer'] = f"A{i}"
+            q['options'] = [f"A{i}", f"B{i}", f"C{i}", f"D{i}"]
+        else:
+            q['answer'] = [f"A{i}", f"B{i}"]
+            q['options'] = [f"A{i}", f"B{i}", f"C{i}", f"D{i}"]
+        bank.append(q)
+    return bank
+
+
+def fill_question_bank(conn, count):
+    """ Insert count synthetic questions spread evenly over the three types """
+    with conn:
+        database.upsert_questions(conn, synthetic_bank(count))
+
+
+def bench_question_cache(bank_size=100000, repeat=20):
+    """ Quiz start latency: query + build dicts per start vs the cached per-type index """
+    import random
+    from question_bank import QuestionCache, QUESTIONS_WITH_OPTIONS, rows_to_questions
+    use_temp_database()
+    conn = database.get_connection()
+    fill_question_bank(conn, bank_size)
+
+    def legacy(question_type):
+        rows = conn.execute(QUESTIONS_WITH_OPTIONS + " WHERE q.type=? ORDER BY q.id, o.ordinal", (question_type,))
+        for q in rows_to_questions(rows):
+            if q['type'] == 'single':
+                random.shuffle(q['options'])
+
+    cache = QuestionCache()
+    start = time.perf_counter()
+    cache.get('single')
+    cold = (time.perf_counter() - start) * 1e6
+    for question_type in ('single', 'multiple'):
+        before = timed(lambda: legacy(question_type), repeat)
+        after = timed(lambda: cache.quiz_questions(question_type), repeat)
+        report(f"start {question_type} quiz ({bank_size} bank)", before, after)
+    print(f"{'':<40} cold cache load: {cold:10.1f} us   {cache.stats()}")
+
+
+def bench_sampling(bank_size=100000, length=15, repeat=200):
+    """ Drawing one quiz: whole type + shuffle vs n random index probes / cache sample """
+    import random
+    from question_bank import QuestionCache, sample_question_ids
+    use_temp_database()
+    conn = database.get_connection()
+    fill_question_bank(conn, bank_size)
+
+    def legacy():
+        rows = conn.execute("SELECT * FROM questions WHERE type=?", ("open",)).fetchall()
+        random.shuffle(rows)
+
+    cache = QuestionCache()
+    cache.get('open')
+    before = timed(legacy, 10)
+    report(f"SQL draw {length} of {bank_size}", before, timed(lambda: sample_question_ids(conn, 'open', length), repeat))
+    report(f"cached draw {length} of {bank_size}", timed(lambda: cache.quiz_questions('open'), 10),
+           timed(lambda: cache.sample('open', length), repeat))
+
+
+def _legacy_grade_open(reference, user_answer):
+    user_answer = user_answer.lower()
+    key_words = [word for word in reference.lower().split() if len(word) > 3][:5]
+    return sum(1 for word in key_words if word in user_answer) >= 2
+
+
+def bench_grading(submissions=20000):
+    """ Open-answer grading throughput: per-call re-tokenizing vs compiled key terms """
+    import json
+    import random
+    from grading import grade_many
+    with open(database.SEED_FILE, encoding='utf-8') as f:
+        bank = [q for q in json.load(f) if q['type'] == 'open']
+    words = ' '.join(q['answer'] for q in bank).split()
+    pairs = [(q, ' '.join(random.choices(words, k=25))) for q in random.choices(bank, k=submissions)]
+
+    def best_of(fn, runs=5):
+        # Best of several runs: single runs of this size vary by +-20%
+        best = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    before = best_of(lambda: [_legacy_grade_open(q['answer'], answer) for q, answer in pairs])
+    after = best_of(lambda: grade_many(pairs))
+    print(f"grade {submissions} open answers            before: {submissions / before:10.0f}/s   after: {submissions / after:10.0f}/s"
+          f"   speedup: {before / after:4.1f}x")
+
+
+def bench_batch_grading(submissions=100000):
+    """ Offline grading throughput with 1 worker vs one worker per core """
+    import io
+    import json
+    import random
+    from batch_grading import grade_stream
+    from question_bank import QuestionCache
+    use_temp_database()
+    conn = database.get_connection()
+    database.seed_questions(conn)
+    uids = dict(conn.execute("SELECT id, uid FROM questions"))
+    questions = [q for t in ('single', 'multiple', 'open') for q in QuestionCache().get(t)]
+    lines = [json.dumps({'user': f"user{i % 100}", 'question_id': uids[q['id']], 'answer': q['answer']})
+             for i, q in enumerate(random.choices(questions, k=submissions))]
+    for workers in sorted({1, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        grade_stream(lines, io.StringIO(), database.DB_FILE, workers)
+        elapsed = time.perf_counter() - start
+        print(f"batch grade {submissions} submissions, {workers} worker(s): {submissions / elapsed:10.0f}/s")
+
+
+def bench_results_import(rows=200000, users=50):
+    """ Bulk results import: per-row execute of a fully loaded file vs. the streaming importer """
+    import json
+    import results_io
+    path = os.path.join(temp_dir(), "results.jsonl")
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(rows):
+            f.write(json.dumps({'username': f"user{i % users}", 'type': ('single', 'multiple', 'open')[i % 3], 'points': i % 16,
+                                'date': time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(1.7e9 + i * 7))}) + '\n')
+
+    def fresh_database():
+        use_temp_database()
+        conn = database.get_connection()
+        with conn:
+            conn.executemany("INSERT INTO users (username, password, email) VALUES (?, 'x', ?)",
+                             [(f"user{i}", f"user{i}@example.com") for i in range(users)])
+        return conn
+
+    conn = fresh_database()
+    start = time.perf_counter()
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    c = conn.cursor()
+    for r in records:
+        c.execute("INSERT INTO results (user_id, type, points, date) VALUES ((SELECT id FROM users WHERE username=?), ?, ?, ?)",
+                  (r['username'], r['type'], r['points'], r['date']))
+    conn.commit()
+    before = time.perf_counter() - start
+    del records
+
+    conn = fresh_database()
+    stats = results_io.import_results(path, conn)
+    again = results_io.import_results(path, conn)
+    assert stats['inserted'] == rows and again['inserted'] == 0
+    assert not database.check_user_stats(conn)
+    print(f"{'import ' + str(rows) + ' results':<40} before: {before:8.2f} s   after: {stats['seconds']:8.2f} s   "
+          f"({rows / stats['seconds']:.0f} rows/s; re-import {again['seconds']:.2f} s, all duplicates)")
+
+
+async def _http(reader, writer, method, path, body=None, token=None):
+    """ Minimal keep-alive JSON client for the load test """
+    import json
+    data = json.dumps(body).encode() if body is not None else b''
+    auth = f"Authorization: Bearer {token}\r\n" if token else ""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\n{auth}Content-Length: {len(data)}\r\n\r\n".encode() + data)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+    return status, json.loads(await reader.readexactly(length))
+
+
+def bench_server(sessions=300):
+    """ Load test: concurrent clients each log in, take a full quiz and finish it """
+    import asyncio
+    import passwords
+    from server import QuizService
+    from user import User
+    use_temp_database()
+    # Measure the service, not the KDF (see the password_hashing benchmark)
+    passwords.configure('scrypt', 10)
+    database.seed_questions(database.get_connection())
+    for i in range(sessions):
+        User.register(f"student{i}", f"student{i}@example.com", "secret")
+    latencies = []
+
+    async def student(i, port):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            async def call(method, path, body=None, token=None):
+                start = time.perf_counter()
+                status, reply = await _http(reader, writer, method, path, body, token)
+                latencies.append(time.perf_counter() - start)
+                assert status == 200, reply
+                return reply
+            token = (await call('POST', '/login', {'username': f"student{i}", 'password': "secret"}))['token']
+            reply = await call('POST', '/quiz/start', {'type': ('single', 'multiple', 'open')[i % 3]}, token)
+            while 'question' in reply:
+                q = reply['question']
+                answer = q['options'][0] if q['type'] == 'single' else q['options'][:2] if q['type'] == 'multiple' else "a protocol that routes packets"
+                reply = await call('POST', '/quiz/answer', {'answer': answer}, token)
+            await call('POST', '/quiz/finish', {}, token)
+        finally:
+            writer.close()
+
+    async def run():
+        service = QuizService()
+        server = await service.serve('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        start = time.perf_counter()
+        async with server:
+            await asyncio.gather(*(student(i, port) for i in range(sessions)))
+        elapsed = time.perf_counter() - start
+        service.close()
+        return elapsed
+
+    elapsed = asyncio.run(run())
+    passwords.configure()
+    latencies.sort()
+    print(f"{sessions} concurrent sessions: {len(latencies)} requests in {elapsed:.2f} s "
+          f"({len(latencies) / elapsed:.0f} req/s), p50 {latencies[len(latencies) // 2] * 1e3:.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:.1f} ms")
+
+
+def bench_password_hashing(target_ms=50, logins=8):
+    """ Calibrate the KDF cost for target_ms per hash, check legacy rehash on login and pool throughput """
+    import hashlib
+    import threading
+    import passwords
+    from user import User
+    for algorithm in passwords.HASHERS:
+        cost = passwords.calibrate(target_ms, algorithm)
+        hasher = passwords.HASHERS[algorithm](cost)
+        ms = timed(lambda: hasher.hash("secret"), 3) / 1000
+        print(f"{algorithm:<14} cost for {target_ms} ms: {cost:<8} measured: {ms:6.1f} ms per hash")
+
+    use_temp_database()
+    conn = database.get_connection()
+    passwords.configure('scrypt', passwords.calibrate(target_ms))
+    # An account from before the KDF: unsalted SHA-256
+    with conn:
+        conn.execute("INSERT INTO users (username, email, password) VALUES ('legacy', 'legacy@example.com', ?)",
+                     (hashlib.sha256(b"secret").hexdigest(),))
+    assert User.login("legacy", "secret")[0]
+    upgraded = conn.execute("SELECT password FROM users WHERE username='legacy'").fetchone()[0]
+    assert upgraded.startswith("scrypt$") and not passwords.needs_rehash(upgraded)
+    assert User.login("legacy", "secret")[0] and not User.login("legacy", "wrong")[0]
+    print(f"legacy SHA-256 hash upgraded on login to {upgraded.split('$', 1)[0]} (cost {upgraded.split('$')[1]})")
+
+    def concurrent_logins():
+        threads = [threading.Thread(target=User.login, args=("legacy", "secret")) for _ in range(logins)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    sequential = timed(lambda: [User.login("legacy", "secret") for _ in range(logins)], 1) / 1000
+    pooled = timed(concurrent_logins, 1) / 1000
+    print(f"{logins} logins: sequential {sequential:.0f} ms, concurrent on {passwords.HASH_WORKERS} hashing workers {pooled:.0f} ms")
+    passwords.configure()
+
+
+def bench_achievements(rules=100, history=1000, completions=300):
+    """ Per-completion cost of 100 achievement rules: re-querying history per rule vs. the incremental engine """
+    import random
+    from achievements import AchievementEngine, Rule
+    from user import User
+    use_temp_database()
+    conn = database.get_connection()
+    rng = random.Random(7)
+    types = ('single', 'multiple', 'open')
+    rule_set = []
+    for i in range(rules):
+        measure = ('quizzes', 'total_points', 'best', 'score', 'day_streak', 'score_streak')[i % 6]
+        threshold = {'quizzes': 10 ** 6, 'total_points': 10 ** 8, 'best': 16, 'score': 16, 'day_streak': 10 ** 4, 'score_streak': 10 ** 4}[measure]
+        rule_set.append(Rule(f"rule {i}", f"benchmark rule {i}", measure, threshold + i,
+                             quiz_type=(None, *types)[i % 4], min_points=5 + i % 10))
+    # Thresholds are out of reach, so every rule is evaluated on every completion
+    engine = AchievementEngine(rule_set)
+    User.register("bench", "bench@example.com", "secret")
+    user_id = User.get_user("bench").id
+    with conn:
+        conn.executemany("INSERT INTO results (user_id, type, points, date) VALUES (?, ?, ?, ?)",
+                         [(user_id, rng.choice(types), rng.randint(0, 15), f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} 12:00:00")
+                          for i in range(history)])
+
+    def legacy(quiz_type, points, date):
+        # One history query per rule, plus its has_achievement check
+        for rule in rule_set:
+            if conn.execute("SELECT 1 FROM achievements WHERE user_id=? AND name=?", (user_id, rule.name)).fetchone():
+                continue
+            type_filter = " AND type=?" if rule.quiz_type else ""
+            params = (user_id, rule.quiz_type) if rule.quiz_type else (user_id,)
+            if rule.measure == 'score':
+                value = points
+            elif rule.measure in ('quizzes', 'total_points', 'best'):
+                agg = {'quizzes': "COUNT(*)", 'total_points': "SUM(points)", 'best': "MAX(points)"}[rule.measure]
+                value = conn.execute(f"SELECT {agg} FROM results WHERE user_id=?" + type_filter, params).fetchone()[0]
+            elif rule.measure == 'day_streak':
+                days = [d for d, in conn.execute("SELECT DISTINCT substr(date, 1, 10) FROM results WHERE user_id=? ORDER BY 1 DESC", (user_id,))]
+                value = 1
+                while value < len(days) and days[value - 1] > days[value]:
+                    value += 1
+            else:
+                value = 0
+                for p, in conn.execute("SELECT points FROM results WHERE user_id=?" + type_filter + " ORDER BY date DESC, id DESC", params):
+                    if p < rule.min_points:
+                        break
+                    value += 1
+            if value >= rule.threshold:
+                conn.execute("INSERT OR IGNORE INTO achievements (user_id, name, description, date) VALUES (?, ?, ?, ?)",
+                             (user_id, rule.name, rule.description, date))
+
+    def complete(evaluate):
+        quiz_type, points = rng.choice(types), rng.randint(0, 15)
+        date = "2025-06-01 12:00:00"
+        with conn:
+            conn.execute("INSERT INTO results (user_id, type, points, date) VALUES (?, ?, ?, ?)", (user_id, quiz_type, points, date))
+            evaluate(quiz_type, points, date)
+
+    before = timed(lambda: complete(legacy), completions // 10)
+    after = timed(lambda: complete(lambda t, p, d: engine.evaluate(conn, user_id, t, p, d)), completions)
+    report(f"quiz completion, {rules} rules ({history}+ results)", before, after)
+
+
+def bench_quiz_completion(completions=200):
+    """ Finishing a quiz: separate writes and read-backs (legacy flow) vs. one finish_quiz transaction.
+
+    finish_quiz also stores every per-question outcome and the streak state
+    atomically, so it does more work than the legacy flow: this measures the
+    cost of that correctness change, it is not expected to be a speedup.
+    """
+    import random
+    import achievements
+    from quiz import Quiz
+    from user import User
+    use_temp_database()
+    conn = database.get_connection()
+    User.register("bench", "bench@example.com", "secret")
+    user = User.get_user("bench")
+    rng = random.Random(3)
+    questions = [{'id': i, 'question': f"q{i}", 'type': 'single', 'options': ['a', 'b'], 'answer': 'a'} for i in range(1, 16)]
+    commits = []
+    conn.set_trace_callback(lambda sql: sql.strip().upper().startswith('COMMIT') and commits.append(sql))
+
+    def legacy():
+        # save_result, then every achievement checked and granted on its own, then the stats read back
+        points = rng.randint(0, 15)
+        conn.execute("INSERT INTO results (user_id, type, points, date) VALUES (?, 'single', ?, datetime('now', 'localtime'))", (user.id, points))
+        conn.commit()
+        for rule in achievements.RULES:
+            if not user.has_achievement(rule.name) and rule.measure == 'score' and points >= rule.threshold:
+                user.grant_achievement(rule.name, rule.description)
+        return user.get_stats(), user.get_type_stats(), user.get_rank(), user.get_achievements()
+
+    def finish():
+        quiz = Quiz(questions, user=user, quiz_type='single')
+        for i in range(len(questions)):
+            quiz.current_question = i
+            quiz.record(rng.choice(('correct', 'incorrect')))
+        return quiz.finish()
+
+    before = timed(legacy, completions)
+    legacy_commits, commits[:] = len(commits), []
+    after = timed(finish, completions)
+    conn.set_trace_callback(None)
+    report(f"quiz completion ({completions} quizzes)", before, after)
+    print(f"  commits per completion: legacy {legacy_commits / completions:.1f} (no per-question outcomes), "
+          f"finish_quiz {len(commits) / completions:.1f} (with {len(questions)} outcomes and the streak state)")
+    assert len(commits) == completions
+    assert not database.check_user_stats(conn)
+
+
+def bench_timers(questions=300, time_limit=45):
+    """ Callback count of the quiz countdown: legacy per-question after() chains vs. the shared tick scheduler.
+
+    The behaviour itself (one pending callback, cancel on navigate/hide/destroy) is tested in test_scheduler.py.
+    """
+    from fake_tk import FakeRoot
+    from scheduler import TickScheduler
+
+    def legacy():
+        # show_question() started a new self-rescheduling chain without cancelling the old one
+        root = FakeRoot()
+        expired = []
+
+        def chain(start):
+            def update():
+                if root.now - start < time_limit:
+                    root.after(1000, update)
+                else:
+                    expired.append(start)
+            update()
+
+        for _ in range(questions):
+            chain(root.now)
+            root.run_until(root.now + 3.5)
+        return root, expired
+
+    def scheduled():
+        root = FakeRoot()
+        scheduler = TickScheduler(root, clock=root.clock)
+        expired = []
+        countdown = None
+        for i in range(questions):
+            # Navigate: cancel the current question's countdown, start the next one
+            scheduler.cancel(countdown)
+            countdown = scheduler.start(time_limit, lambda left: None, lambda: expired.append(1))
+            root.run_until(root.now + 3.5)
+        scheduler.cancel(countdown)
+        return root, scheduler, root.now
+
+    old, old_expired = legacy()
+    new, scheduler, elapsed = scheduled()
+    print(f"{questions} questions, 3.5 s each ({elapsed:.0f} s):")
+    print(f"  legacy after() chains     callbacks: {old.scheduled:7d}   max pending: {old.max_pending:4d}   "
+          f"'Time's up' from stale chains: {len(old_expired)}")
+    print(f"  shared tick scheduler     callbacks: {new.scheduled:7d}   max pending: {new.max_pending:4d}   "
+          f"wakeups: {scheduler.wakeups} (<= 1 per second)")
+
+
+def bench_transitions(questions=300):
+    """ Question transition time: legacy destroy/recreate of option widgets vs. the pooled QuizScreen """
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"{'question transitions':<40} skipped ({e})")
+        return
+    from gui import QuizScreen
+    from quiz import Quiz
+    bank = []
+    for i in range(questions):
+        qtype = ('single', 'multiple', 'open')[i % 3]
+        options = [f"Option {i}.{j}" for j in range(4 + i % 3)] if qtype != 'open' else []
+        bank.append({'question': f"Question {i}?", 'type': qtype, 'options': options,
+                     'answer': options[:2] if qtype == 'multiple' else (options[0] if options else "reference answer")})
+
+    def legacy():
+        # What show_question used to do: destroy every option widget, build new ones and new IntVars
+        frame = tk.Frame(root)
+        frame.pack()
+        start = time.perf_counter()
+        for q in bank:
+            for widget in frame.winfo_children():
+                widget.destroy()
+            for opt in q['options']:
+                var = tk.IntVar()
+                widget_class = tk.Radiobutton if q['type'] == 'single' else tk.Checkbutton
+                widget_class(frame, text=opt, variable=var, anchor='w').pack(fill='x', padx=10, pady=2)
+            root.update_idletasks()
+        elapsed = time.perf_counter() - start
+        frame.destroy()
+        return elapsed / len(bank) * 1e6
+
+    def pooled():
+        screen = QuizScreen(root, Quiz(bank), lambda: None)
+        screen.pack()
+        quiz = screen.quiz
+        start = time.perf_counter()
+        for _ in range(len(bank) - 1):
+            quiz.current_question += 1
+            screen.show_question()
+            root.update_idletasks()
+        elapsed = time.perf_counter() - start
+        screen.destroy()
+        return elapsed / (len(bank) - 1) * 1e6
+
+    report(f"question transition ({questions} questions)", legacy(), pooled())
+    root.destroy()
+
+
+class _RealtimeTk:
+    """ Minimal real-time event loop with the after() API of a Tk root """
+    def __init__(self):
+        self.queue = {}
+        self.next_id = 0
+
+    def after(self, ms, fn):
+        self.next_id += 1
+        self.queue[self.next_id] = (time.monotonic() + ms / 1000, fn)
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.queue.pop(after_id, None)
+
+    def config(self, **options):
+        pass
+
+    def run(self, seconds):
+        end = time.monotonic() + seconds
+        while True:
+            now = time.monotonic()
+            if now >= end:
+                break
+            due = [(t, i) for i, (t, _) in self.queue.items() if t <= now]
+            if not due:
+                time.sleep(min(min((t for t, _ in self.queue.values()), default=end), end) - now)
+                continue
+            _, after_id = min(due)
+            self.queue.pop(after_id)[1]()
+
+
+def bench_ui_latency(lock_ms=500):
+    """ Event-loop stalls while saving a result during another instance's write lock: on the UI thread vs. the DB worker """
+    import threading
+    from dbworker import DBWorker, StallProbe
+    from user import User
+    use_temp_database()
+    User.register("bench", "bench@example.com", "secret")
+    user = User.get_user("bench")
+
+    def hold_lock(locked):
+        other = database.create_connection(database.DB_FILE)
+        other.execute("BEGIN IMMEDIATE")
+        locked.set()
+        time.sleep(lock_ms / 1000)
+        other.rollback()
+        other.close()
+
+    def scenario(on_worker):
+        root = _RealtimeTk()
+        probe = StallProbe(root)
+        db = DBWorker(root)
+        saved = []
+        probe.start()
+        root.run(0.2)
+        locked = threading.Event()
+        locker = threading.Thread(target=hold_lock, args=(locked,))
+        locker.start()
+        locked.wait()
+
+        def click():
+            # What a "finish quiz" button does
+            if on_worker:
+                db.submit(lambda: user.save_result('single', 5), saved.append)
+            else:
+                saved.append(user.save_result('single', 5))
+
+        root.after(0, click)
+        root.run(lock_ms / 1000 + 0.3)
+        locker.join()
+        probe.stop()
+        db.shutdown()
+        assert len(saved) == 1
+        return probe
+
+    for label, on_worker in (("on the UI thread", False), ("on the DB worker", True)):
+        probe = scenario(on_worker)
+        print(f"save during a {lock_ms} ms lock, {label:<18} {probe.summary()}")
+
+
+# Cold-start budgets for main.py, in milliseconds
+IMPORT_BUDGET_MS = 150
+FIRST_FRAME_BUDGET_MS = 1000
+
+_FIRST_FRAME = """
+import sys, time
+start = time.perf_counter()
+import database
+database.DB_FILE = sys.argv[1]
+import main
+main.init_database()
+app = main.App()
+app.update()
+print(time.perf_counter() - start)
+app.destroy()
+"""
+
+
+def _import_time_ms(module, cwd):
+    """ Cumulative import time of module in a fresh interpreter, from python -X importtime """
+    import subprocess
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                          cwd=cwd, capture_output=True, text=True, check=True)
+    for line in proc.stderr.splitlines():
+        fields = [f.strip() for f in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000
+    raise RuntimeError(f"no importtime entry for {module}")
+
+
+def bench_startup(runs=5):
+    """ Cold start of main.py: import cost and time to the first drawn frame; exits 1 past the budget """
+    import subprocess
+    here = os.path.dirname(os.path.abspath(__file__))
+    import_ms = min(_import_time_ms('main', here) for _ in range(runs))
+    print(f"{'import main (-X importtime, best of ' + str(runs) + ')':<40} {import_ms:8.1f} ms   budget: {IMPORT_BUDGET_MS} ms")
+    failed = import_ms > IMPORT_BUDGET_MS
+
+    db_file = use_temp_database()
+    database.close_connection()
+    frames = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, '-c', _FIRST_FRAME, db_file], cwd=here, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{'time to first frame':<40} skipped ({proc.stderr.strip().splitlines()[-1]})")
+            break
+        frames.append(float(proc.stdout.split()[-1]) * 1000)
+    if frames:
+        frame_ms = min(frames)
+        print(f"{'time to first frame (best of ' + str(runs) + ')':<40} {frame_ms:8.1f} ms   budget: {FIRST_FRAME_BUDGET_MS} ms")
+        failed = failed or frame_ms > FIRST_FRAME_BUDGET_MS
+    if failed:
+        print("Cold start is over budget")
+        sys.exit(1)
+
+
+BENCHMARKS = {
+    'connection': bench_connection,
+    'user_session': bench_user_session,
+    'password_hashing': bench_password_hashing,
+    'achievements': bench_achievements,
+    'quiz_completion': bench_quiz_completion,
+    'migration': bench_migration,
+    'question_cache': bench_question_cache,
+    'sampling': bench_sampling,
+    'grading': bench_grading,
+    'batch_grading': bench_batch_grading,
+    'results_import': bench_results_import,
+    'server': bench_server,
+    'startup': bench_startup,
+    'timers': bench_timers,
+    'transitions': bench_transitions,
+    'ui_latency': bench_ui_latency,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name} (available: {', '.join(BENCHMARKS)})")
+            sys.exit(2)
+        try:
+            BENCHMARKS[name]()
+        finally:
+            remove_temp_dirs()
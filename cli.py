@@ -0,0 +1,202 @@
+"""
+Command-line maintenance tasks for the quiz database.
+
+Usage:
+    python cli.py <command> [options]
+
+Commands:
+    rebuild-leaderboard   Re-derive the leaderboard table from results.
+    check-stats           Validate per-user statistics against results (--repair to rebuild).
+    grade                 Grade a JSONL dump of submissions against the question bank.
+    export-results        Stream results to a JSONL or CSV file (gzip when it ends in .gz).
+    import-results        Bulk-import results from such a file, skipping duplicates.
+    import-questions      Import a JSONL question bank (--dry-run to only show the diff).
+    export-questions      Export the question bank as JSONL.
+    calibrate-passwords   Pick the password hashing cost for a target latency (--save to use it).
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+
+import database
+
+
+def cmd_rebuild_leaderboard(args):
+    conn = database.create_database()
+    ranked = database.rebuild_leaderboard(conn)
+    print(f"Leaderboard rebuilt: {ranked} users ranked.")
+    return 0
+
+
+def cmd_check_stats(args):
+    conn = database.create_database()
+    mismatches = database.check_user_stats(conn)
+    for table, user_id, quiz_type in mismatches:
+        print(f"{table}: user {user_id}" + (f" type {quiz_type}" if quiz_type else "") + " does not match results")
+    if mismatches and args.repair:
+        database.rebuild_user_stats(conn)
+        print("Statistics rebuilt from results.")
+        return 0
+    print(f"{len(mismatches)} mismatches.")
+    return 1 if mismatches else 0
+
+
+def cmd_grade(args):
+    from batch_grading import grade_stream
+    database.create_database()
+    start = time.perf_counter()
+    # nullcontext: leaving the with block must not close stdin/stdout
+    with (open(args.submissions, encoding='utf-8') if args.submissions != '-' else contextlib.nullcontext(sys.stdin)) as src, \
+            (open(args.output, 'w', encoding='utf-8') if args.output != '-' else contextlib.nullcontext(sys.stdout)) as out:
+        graded, totals = grade_stream(src, out, database.DB_FILE, args.workers, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    if args.totals:
+        with open(args.totals, 'w', encoding='utf-8') as f:
+            for user, t in sorted(totals.items()):
+                f.write(json.dumps({'user': user, **t}) + '\n')
+    print(f"Graded {graded} submissions from {len(totals)} users in {elapsed:.2f} s "
+          f"({graded / elapsed if elapsed else 0:.0f}/s).", file=sys.stderr)
+    return 0
+
+
+def cmd_export_results(args):
+    from results_io import export_results
+    conn = database.create_database()
+    user_id = None
+    if args.user is not None:
+        # Map the name to its id once; the export filters on results.user_id
+        row = conn.execute("SELECT id FROM users WHERE username=?", (args.user,)).fetchone()
+        if row is None:
+            print(f"Unknown user: {args.user}", file=sys.stderr)
+            return 1
+        user_id = row[0]
+    start = time.perf_counter()
+    count = export_results(args.path, fmt=args.format, user_id=user_id, since=args.since,
+                           until=args.until, quiz_type=args.type)
+    elapsed = time.perf_counter() - start
+    print(f"Exported {count} results to {args.path} in {elapsed:.2f} s "
+          f"({count / elapsed if elapsed else 0:.0f}/s).", file=sys.stderr)
+    return 0
+
+
+def cmd_import_results(args):
+    from results_io import import_results
+    database.create_database()
+    try:
+        stats = import_results(args.path, fmt=args.format, batch_size=args.batch_size)
+    except ValueError as e:
+        print(f"Cannot import {args.path}: {e}", file=sys.stderr)
+        return 1
+    elapsed = stats['seconds']
+    print(f"Read {stats['read']} rows in {elapsed:.2f} s ({stats['read'] / elapsed if elapsed else 0:.0f}/s): "
+          f"{stats['inserted']} imported, {stats['duplicates']} duplicates, "
+          f"{stats['unknown_users']} unknown users, {stats['invalid']} invalid.", file=sys.stderr)
+    return 0
+
+
+def cmd_import_questions(args):
+    from question_io import import_bank
+    database.create_database()
+    symbols = {'added': '+', 'changed': '~', 'invalid': '!'}
+
+    def show(status, line, detail):
+        if args.verbose or args.dry_run:
+            print(f"{symbols[status]} line {line}: {detail}")
+
+    with (open(args.path, encoding='utf-8') if args.path != '-' else contextlib.nullcontext(sys.stdin)) as src:
+        stats = import_bank(src, dry_run=args.dry_run, on_diff=show, workers=args.workers)
+    print(f"{'Would import' if args.dry_run else 'Imported'}: {stats['added']} new, {stats['changed']} changed, "
+          f"{stats['unchanged']} unchanged, {stats['invalid']} invalid ({stats['seconds']:.2f} s).", file=sys.stderr)
+    return 1 if stats['invalid'] else 0
+
+
+def cmd_export_questions(args):
+    from question_io import export_bank
+    database.create_database()
+    with (open(args.path, 'w', encoding='utf-8') if args.path != '-' else contextlib.nullcontext(sys.stdout)) as out:
+        count = export_bank(out, quiz_type=args.type)
+    print(f"Exported {count} questions.", file=sys.stderr)
+    return 0
+
+
+def cmd_calibrate_passwords(args):
+    import passwords
+    cost = passwords.calibrate(args.target_ms, args.algorithm)
+    hasher = passwords.HASHERS[args.algorithm](cost)
+    start = time.perf_counter()
+    hasher.hash("calibration")
+    print(f"{args.algorithm}: cost {cost} takes {(time.perf_counter() - start) * 1000:.0f} ms per hash (target {args.target_ms} ms).")
+    if args.save:
+        passwords.save_settings(database.create_database(), args.algorithm, cost)
+        print("Saved; new and re-hashed passwords use it from the next login.")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Programming Quiz maintenance commands")
+    parser.add_argument('--db', default=database.DB_FILE, help="database file (default: %(default)s)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('rebuild-leaderboard', help="re-derive the leaderboard from results")
+    p.set_defaults(func=cmd_rebuild_leaderboard)
+
+    p = sub.add_parser('check-stats', help="validate per-user statistics against results")
+    p.add_argument('--repair', action='store_true', help="rebuild the statistics if they are inconsistent")
+    p.set_defaults(func=cmd_check_stats)
+
+    p = sub.add_parser('grade', help="grade a JSONL file of submissions")
+    p.add_argument('submissions', help="JSONL file ('-' for stdin), one {user, question_id, answer} per line")
+    p.add_argument('-o', '--output', default='-', help="verdicts JSONL file (default: stdout)")
+    p.add_argument('--totals', help="write per-user totals JSONL to this file")
+    p.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    p.add_argument('--chunk-size', type=int, default=2000, help="submissions per work unit")
+    p.set_defaults(func=cmd_grade)
+
+    p = sub.add_parser('export-results', help="stream results to a JSONL or CSV file")
+    p.add_argument('path', help="output file; .csv for CSV, otherwise JSONL; add .gz to compress")
+    p.add_argument('--format', choices=('jsonl', 'csv'), help="override the format implied by the file name")
+    p.add_argument('--user', help="only this username")
+    p.add_argument('--since', help="only results on or after this date (YYYY-MM-DD)")
+    p.add_argument('--until', help="only results on or before this date (YYYY-MM-DD)")
+    p.add_argument('--type', choices=('single', 'multiple', 'open'), help="only this quiz type")
+    p.set_defaults(func=cmd_export_results)
+
+    p = sub.add_parser('import-results', help="bulk-import results from a JSONL or CSV file")
+    p.add_argument('path', help="input file; .csv for CSV, otherwise JSONL; .gz is decompressed")
+    p.add_argument('--format', choices=('jsonl', 'csv'), help="override the format implied by the file name")
+    p.add_argument('--batch-size', type=int, default=50000, help="rows per executemany batch")
+    p.set_defaults(func=cmd_import_results)
+
+    p = sub.add_parser('import-questions', help="import a JSONL question bank")
+    p.add_argument('path', help="JSONL file ('-' for stdin), one question per line (see question_io.py)")
+    p.add_argument('--dry-run', action='store_true', help="only print what would be added or changed")
+    p.add_argument('-v', '--verbose', action='store_true', help="print every added, changed or invalid line")
+    p.add_argument('--workers', type=int, default=None, help="parser processes (default: CPU count)")
+    p.set_defaults(func=cmd_import_questions)
+
+    p = sub.add_parser('export-questions', help="export the question bank as JSONL")
+    p.add_argument('path', help="output file ('-' for stdout)")
+    p.add_argument('--type', choices=('single', 'multiple', 'open'), help="only this question type")
+    p.set_defaults(func=cmd_export_questions)
+
+    p = sub.add_parser('calibrate-passwords', help="pick the password hashing cost for a target latency")
+    p.add_argument('--target-ms', type=float, default=50, help="time one hash may take (default: %(default)s)")
+    p.add_argument('--algorithm', choices=('scrypt', 'pbkdf2_sha256'), default='scrypt')
+    p.add_argument('--save', action='store_true', help="store the result in the database so logins use it")
+    p.set_defaults(func=cmd_calibrate_passwords)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    database.DB_FILE = args.db
+    try:
+        return args.func(args)
+    finally:
+        database.close_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
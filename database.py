@@ -1,15 +1,99 @@
+import hashlib
+import json
+import os
 import sqlite3
+import threading
+from migrations import migrate, BUMP_RESULTS_REVISION, USER_STATS_FROM_RESULTS, USER_TYPE_STATS_FROM_RESULTS
+
+DB_FILE = "knowledge_tests.db"
+SEED_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "questions.json")
+
+# Applied to every shared connection when it is opened
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+)
+
+_local = threading.local()
+_connections = []
+_lock = threading.Lock()
+_generation = 0
+_schema_ready = False
 
 def create_connection(db_file):
     """ Create a database connection to a SQLite database """
     conn = None
     try:
-        conn = sqlite3.connect(db_file)
-        print(sqlite3.version)
+        conn = sqlite3.connect(db_file, check_same_thread=False)
     except sqlite3.Error as e:
         print(e)
     return conn
 
+def get_connection():
+    """ Return the shared connection of the calling thread, opening it on first use """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.generation == _generation:
+        return conn
+    conn = create_connection(DB_FILE)
+    if conn is None:
+        return None
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    _ensure_schema(conn)
+    with _lock:
+        _connections.append(conn)
+        _local.conn = conn
+        _local.generation = _generation
+    return conn
+
+def _ensure_schema(conn):
+    """ Run pending migrations once per process, on the first connection opened """
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _lock:
+        if not _schema_ready:
+            migrate(conn)
+            _schema_ready = True
+
+def check_connection():
+    """ Health check: True if the shared connection answers a trivial query """
+    try:
+        conn = get_connection()
+        return conn is not None and conn.execute("SELECT 1").fetchone() == (1,)
+    except sqlite3.Error as e:
+        print(e)
+        return False
+
+def close_connection():
+    """ Close every shared connection; threads reconnect lazily on next use """
+    global _generation, _schema_ready
+    with _lock:
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                print(e)
+        _connections.clear()
+        _generation += 1
+        _schema_ready = False
+
+def _after_fork():
+    """ A forked child must not use, or close, the SQLite handles it inherited: start it with none """
+    global _local, _connections, _lock, _inherited
+    # Keep the inherited objects referenced, so garbage collection never closes them in the child
+    _inherited = (_local, _connections)
+    _local = threading.local()
+    _connections = []
+    _lock = threading.Lock()
+
+_inherited = None
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
 def create_table(conn, create_table_sql):
     """ Create a table from the create_table_sql statement """
     try:
@@ -18,14 +102,126 @@ def create_table(conn, create_table_sql):
     except sqlite3.Error as e:
         print(e)
 
-def insert_question(conn, question, question_type, correct_answer, incorrect_options=None):
-    """ Insert a question into the questions table """
-    sql = ''' INSERT INTO questions(question,type,correct_answer,incorrect_options)
-              VALUES(?,?,?,?) '''
+def insert_question(conn, question, question_type, correct_answer, options=None):
+    """ Insert a question into the questions table.
+
+    correct_answer is the answer text (a list of texts for multiple choice);
+    options lists every choice shown for single/multiple choice questions.
+    """
+    display = ', '.join(correct_answer) if isinstance(correct_answer, list) else correct_answer
+    answers = set(correct_answer) if isinstance(correct_answer, list) else {correct_answer}
     cur = conn.cursor()
-    cur.execute(sql, (question, question_type, correct_answer, incorrect_options))
+    cur.execute("INSERT INTO questions (question, type, correct_answer, source) VALUES (?, ?, ?, 'manual')",
+                (question, question_type, display))
+    qid = cur.lastrowid
+    cur.execute("UPDATE questions SET uid = 'manual-' || id WHERE id = ?", (qid,))
+    cur.executemany("INSERT INTO question_options (question_id, ordinal, text, is_correct) VALUES (?, ?, ?, ?)",
+                    [(qid, i, text, int(text in answers)) for i, text in enumerate(options or [])])
     conn.commit()
-    return cur.lastrowid
+    return qid
+
+def get_meta(conn, key, default=None):
+    """ Read a value from the meta table """
+    row = conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+    return row[0] if row else default
+
+def set_meta(conn, key, value):
+    """ Write a value to the meta table (caller commits) """
+    conn.execute("INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                 (key, value))
+
+def upsert_questions(conn, bank, source='seed'):
+    """ Upsert question-bank entries on their stable ids and replace their options.
+
+    Entries are dicts with 'id', 'type', 'question', 'answer' (a string, or a
+    list for multiple choice) and 'options' for choice questions. The caller
+    owns the transaction. Returns the database ids in the order of bank.
+    """
+    rows = []
+    for q in bank:
+        answer = ', '.join(q['answer']) if isinstance(q['answer'], list) else q['answer']
+        rows.append((q['id'], q['question'], q['type'], answer, source))
+    conn.executemany(
+        """INSERT INTO questions (uid, question, type, correct_answer, incorrect_options, source)
+           VALUES (?, ?, ?, ?, NULL, ?)
+           ON CONFLICT(uid) DO UPDATE SET
+               question=excluded.question, type=excluded.type,
+               correct_answer=excluded.correct_answer, source=excluded.source""",
+        rows)
+    ids = [conn.execute("SELECT id FROM questions WHERE uid=?", (q['id'],)).fetchone()[0] for q in bank]
+    options = []
+    for qid, q in zip(ids, bank):
+        answers = set(q['answer']) if isinstance(q['answer'], list) else {q['answer']}
+        options.extend((qid, i, text, int(text in answers)) for i, text in enumerate(q.get('options') or []))
+    conn.executemany("DELETE FROM question_options WHERE question_id=?", [(qid,) for qid in ids])
+    conn.executemany("INSERT INTO question_options (question_id, ordinal, text, is_correct) VALUES (?, ?, ?, ?)", options)
+    return ids
+
+def seed_questions(conn, path=SEED_FILE):
+    """ Sync the seed question bank into the database.
+
+    The file is fingerprinted with SHA-256; if the fingerprint matches the one
+    stored in meta nothing is written. Otherwise the bank is upserted on its
+    stable ids in one transaction and seed questions no longer in the file are
+    removed. Returns True if the database was changed.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    fingerprint = hashlib.sha256(raw).hexdigest()
+    if get_meta(conn, 'seed_hash') == fingerprint:
+        return False
+    bank = json.loads(raw)
+    uids = {q['id'] for q in bank}
+    with conn:
+        upsert_questions(conn, bank)
+        stale = [(row[0],) for row in conn.execute("SELECT id, uid FROM questions WHERE source='seed'")
+                 if row[1] not in uids]
+        conn.executemany("DELETE FROM questions WHERE id=?", stale)
+        set_meta(conn, 'seed_hash', fingerprint)
+    return True
+
+def rebuild_leaderboard(conn):
+    """ Re-derive the leaderboard from the results table; returns the number of ranked users """
+    with conn:
+        conn.execute("DELETE FROM leaderboard")
+        conn.execute("INSERT INTO leaderboard (user_id, total_points, quizzes) SELECT user_id, SUM(points), COUNT(*) FROM results GROUP BY user_id")
+    return conn.execute("SELECT COUNT(*) FROM leaderboard").fetchone()[0]
+
+def rebuild_user_stats(conn):
+    """ Re-derive user_stats and user_type_stats from the results table """
+    with conn:
+        conn.execute("DELETE FROM user_stats")
+        conn.execute("DELETE FROM user_type_stats")
+        conn.execute(USER_STATS_FROM_RESULTS.format(where=""))
+        conn.execute(USER_TYPE_STATS_FROM_RESULTS.format(where=""))
+
+def refresh_user_aggregates(conn, user_ids):
+    """ Re-derive the leaderboard and statistics rows of the given users and bump their results revision.
+
+    For writes made with the results triggers suspended; the caller owns the transaction.
+    """
+    for user_id in user_ids:
+        conn.execute("DELETE FROM leaderboard WHERE user_id = ?", (user_id,))
+        conn.execute("INSERT INTO leaderboard (user_id, total_points, quizzes) SELECT user_id, SUM(points), COUNT(*) FROM results WHERE user_id = ? GROUP BY user_id", (user_id,))
+        conn.execute("DELETE FROM user_stats WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM user_type_stats WHERE user_id = ?", (user_id,))
+        conn.execute(USER_STATS_FROM_RESULTS.format(where="WHERE user_id = ?"), (user_id,))
+        conn.execute(USER_TYPE_STATS_FROM_RESULTS.format(where="WHERE user_id = ?"), (user_id,))
+        conn.execute(BUMP_RESULTS_REVISION.format(user_id="?"), (user_id,))
+
+def check_user_stats(conn):
+    """ Compare the aggregates with the raw results; returns a list of (table, user_id, type) mismatches """
+    mismatches = []
+    for table, columns, query in (
+        ("user_stats", "user_id, NULL, quizzes, total_points, best, last_played",
+         "SELECT user_id, NULL, COUNT(*), SUM(points), MAX(points), MAX(date) FROM results GROUP BY user_id"),
+        ("user_type_stats", "user_id, type, quizzes, total_points, best",
+         "SELECT user_id, type, COUNT(*), SUM(points), MAX(points) FROM results GROUP BY user_id, type"),
+    ):
+        stored = f"SELECT {columns} FROM {table}"
+        rows = conn.execute(f"SELECT * FROM ({stored} EXCEPT {query}) UNION SELECT * FROM ({query} EXCEPT {stored})")
+        mismatches.extend(sorted({(table, row[0], row[1]) for row in rows}, key=str))
+    return mismatches
 
 def check_questions(conn):
     """Check questions in the database"""
@@ -39,61 +235,10 @@ def check_questions(conn):
     return total, types
 
 def create_database():
-    database = "knowledge_tests.db"
-
-    sql_create_users_table = """
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY,
-        username TEXT NOT NULL UNIQUE,
-        email TEXT NOT NULL,
-        password TEXT NOT NULL
-    );
-    """
-
-    sql_create_achievements_table = """
-    CREATE TABLE IF NOT EXISTS achievements (
-        id INTEGER PRIMARY KEY,
-        user_id INTEGER NOT NULL,
-        name TEXT NOT NULL,
-        description TEXT,
-        date TEXT NOT NULL,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    );
-    """
-
-    sql_create_questions_table = """
-    CREATE TABLE IF NOT EXISTS questions (
-        id INTEGER PRIMARY KEY,
-        question TEXT NOT NULL,
-        type TEXT NOT NULL,
-        correct_answer TEXT NOT NULL,
-        incorrect_options TEXT
-    );
-    """
-
-    sql_create_results_table = """
-    CREATE TABLE IF NOT EXISTS results (
-        id INTEGER PRIMARY KEY,
-        user_id INTEGER NOT NULL,
-        type TEXT NOT NULL,
-        points INTEGER NOT NULL,
-        date TEXT NOT NULL,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    );
-    """
-
-    # create a database connection
-    conn = create_connection(database)
-
-    # create tables
-    if conn is not None:
-        create_table(conn, sql_create_users_table)
-        create_table(conn, sql_create_achievements_table)
-        create_table(conn, sql_create_questions_table)
-        create_table(conn, sql_create_results_table)
-        return conn
-    else:
+    """ Ensure the schema is current and return the shared connection """
+    conn = get_connection()
+    if conn is None:
         print("Error! cannot create the database connection.")
-        return None
+    return conn
 
 # TODO: add user/achievement management functions
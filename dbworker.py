@@ -0,0 +1,148 @@
+"""
+Database access off the Tk thread.
+
+DBWorker runs database calls on a small thread pool (each pool thread uses
+its own shared connection from database.get_connection) and hands the
+results back to the Tk thread: workers only append to a queue, and one
+after() chain on the Tk side, alive only while calls are in flight, runs the
+callbacks. While anything is pending the window shows a busy cursor.
+
+StallProbe measures the event loop itself: it asks to run every interval_ms
+and records every tick that ran more than threshold_ms late, i.e. every
+time the UI could not react to input for that long.
+"""
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from logger import log_error
+
+WORKERS = 2
+POLL_MS = 15
+STALL_MS = 50
+PROBE_MS = 20
+
+
+class DBWorker:
+    def __init__(self, root, workers=WORKERS, poll_ms=POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix='db')
+        self.done = deque()  # (callbacks, result, error) appended by the workers
+        self.in_flight = 0
+        self.pending = None  # id of the one outstanding after() callback
+
+    def submit(self, fn, on_done=None, on_error=None, owner=None):
+        """ Run fn() on a pool thread (call from the Tk thread); on_done(result) or on_error(exception) then run on the Tk thread.
+
+        Callbacks are dropped if owner (a widget) was destroyed meanwhile.
+        Without on_error the exception is logged.
+        """
+        callbacks = (on_done, on_error, owner)
+        self.in_flight += 1
+        if self.in_flight == 1:
+            self.set_busy(True)
+        if self.pending is None:
+            self.pending = self.root.after(self.poll_ms, self._poll)
+        return self.pool.submit(self._run, fn, callbacks)
+
+    def _run(self, fn, callbacks):
+        """ Pool thread: never touches Tk """
+        try:
+            self.done.append((callbacks, fn(), None))
+        except Exception as e:
+            self.done.append((callbacks, None, e))
+
+    def _poll(self):
+        self.pending = None
+        while self.done:
+            (on_done, on_error, owner), result, error = self.done.popleft()
+            self.in_flight -= 1
+            if owner is not None and not _exists(owner):
+                continue
+            try:
+                if error is None:
+                    if on_done:
+                        on_done(result)
+                elif on_error:
+                    on_error(error)
+                else:
+                    log_error(f"Database error: {error}")
+            except Exception as e:
+                log_error(f"Error in database callback: {e}")
+        if self.in_flight:
+            self.pending = self.root.after(self.poll_ms, self._poll)
+        else:
+            self.set_busy(False)
+
+    def set_busy(self, busy):
+        """ Loading state of the whole window: a busy cursor while calls are in flight """
+        try:
+            self.root.config(cursor='watch' if busy else '')
+        except Exception:
+            pass  # window already gone
+
+    def shutdown(self):
+        _cancel(self.root, self.pending)
+        self.pending = None
+        self.pool.shutdown(wait=False)
+
+
+def _cancel(root, after_id):
+    if after_id is not None:
+        try:
+            root.after_cancel(after_id)
+        except Exception:
+            pass  # window already gone
+
+
+def _exists(widget):
+    try:
+        return bool(widget.winfo_exists())
+    except Exception:
+        return False
+
+
+def get_db_worker(widget):
+    """ The DB worker of widget's application, created on first use """
+    root = widget.winfo_toplevel()
+    worker = getattr(root, 'db_worker', None)
+    if worker is None:
+        worker = root.db_worker = DBWorker(root)
+    return worker
+
+
+class StallProbe:
+    """ Records event-loop stalls: after() ticks that ran more than threshold_ms late """
+    def __init__(self, root, threshold_ms=STALL_MS, interval_ms=PROBE_MS, clock=time.monotonic, keep=100):
+        self.root = root
+        self.threshold_ms = threshold_ms
+        self.interval_ms = interval_ms
+        self.clock = clock
+        self.stalls = deque(maxlen=keep)  # (clock time the stall ended, ms late), newest last
+        self.count = 0
+        self.worst_ms = 0.0
+        self.last = None
+        self.pending = None
+
+    def start(self):
+        self.last = self.clock()
+        self.pending = self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        _cancel(self.root, self.pending)
+        self.pending = None
+
+    def _tick(self):
+        now = self.clock()
+        # Event-loop lag: how much later than asked this tick ran
+        late = (now - self.last) * 1000 - self.interval_ms
+        if late > self.threshold_ms:
+            self.count += 1
+            self.worst_ms = max(self.worst_ms, late)
+            self.stalls.append((now, late))
+        self.last = now
+        self.pending = self.root.after(self.interval_ms, self._tick)
+
+    def summary(self):
+        return f"{self.count} UI stalls over {self.threshold_ms} ms, worst {self.worst_ms:.0f} ms"
@@ -0,0 +1,38 @@
+"""
+A fake Tk root for driving after()-based code without a display: callbacks
+are recorded and fired on a simulated clock. Shared by test_scheduler.py and
+"python benchmark.py timers".
+"""
+
+
+class FakeRoot:
+    """ Stand-in for a Tk root: records after() callbacks and fires them on a simulated clock """
+    def __init__(self):
+        self.now = 0.0
+        self.queue = {}
+        self.next_id = 0
+        self.scheduled = 0
+        self.max_pending = 0
+
+    def clock(self):
+        return self.now
+
+    def after(self, ms, fn):
+        self.next_id += 1
+        self.queue[self.next_id] = (self.now + ms / 1000, fn)
+        self.scheduled += 1
+        self.max_pending = max(self.max_pending, len(self.queue))
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.queue.pop(after_id, None)
+
+    def run_until(self, t):
+        while self.queue:
+            after_id, (due, fn) = min(self.queue.items(), key=lambda item: item[1][0])
+            if due > t:
+                break
+            del self.queue[after_id]
+            self.now = due
+            fn()
+        self.now = t
@@ -0,0 +1,143 @@
+"""
+Answer grading engine.
+
+Open answers are graded against key terms of the reference answer: the first
+KEY_TERMS distinct words longer than three letters, normalized and stemmed.
+Terms are compiled once per reference answer into the set of surface forms
+that share their stem, and a submission is graded by intersecting its word
+set with them - whole words only, so "port" no longer matches inside
+"support". Single and multiple choice keep their exact rules.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+KEY_TERMS = 5
+MIN_MATCHES = 2
+
+# Every ASCII character other than a letter, digit, '+' or '#' separates words
+_SEPARATORS = str.maketrans({chr(c): ' ' for c in range(128) if not (chr(c).isalnum() or chr(c) in '+#')})
+_SUFFIXES = ('ations', 'ation', 'ings', 'ing', 'ies', 'ied', 'ers', 'er', 'ed', 'es', 'ly', 's')
+
+# correct: bool; matched/missing: key terms found / not found (open questions only)
+Grade = namedtuple('Grade', ['correct', 'matched', 'missing'])
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    """ Crude suffix-stripping stemmer; keeps at least three letters of the stem """
+    if word.endswith('sses'):
+        return word[:-2]
+    if word.endswith('ss'):
+        return word
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            if suffix in ('ies', 'ied'):
+                return word + 'y'
+            break
+    if word.endswith('e') and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def words(text):
+    """ Set of lower-cased words of text (letters, digits, '+' and '#') """
+    return set(text.lower().translate(_SEPARATORS).split())
+
+
+def tokens(text):
+    """ Set of stemmed, lower-cased word tokens of text """
+    return {stem(w) for w in words(text)}
+
+
+def _surface_forms(s):
+    """ Every word that stem() maps to s, so matching is a plain set lookup """
+    candidates = {s, s + 'e'}
+    for suffix in _SUFFIXES:
+        candidates.update((s + suffix, s + 'e' + suffix))
+    if s.endswith('y'):
+        candidates.update((s[:-1] + 'ies', s[:-1] + 'ied'))
+    return frozenset(w for w in candidates if stem(w) == s)
+
+
+@lru_cache(maxsize=4096)
+def compile_key_terms(reference):
+    """ Ordered tuple of (word, prefix, surface forms) key terms of a reference answer.
+
+    prefix is a substring shared by every surface form; when it does not occur
+    in a submission the term cannot match and the submission is never split.
+    """
+    terms = []
+    seen = set()
+    for word in reference.lower().translate(_SEPARATORS).split():
+        s = stem(word)
+        if len(word) > 3 and s not in seen:
+            seen.add(s)
+            terms.append((word, s[:-1] if s.endswith('y') else s, _surface_forms(s)))
+            if len(terms) == KEY_TERMS:
+                break
+    return tuple(terms)
+
+
+def grade_open(reference, user_answer):
+    """ Grade an open answer; correct when at least MIN_MATCHES key terms are present """
+    return _grade_terms(compile_key_terms(reference), user_answer)
+
+
+def _grade_terms(terms, user_answer):
+    """ Grade an open answer against compiled key terms (see compile_key_terms) """
+    text = user_answer.lower()
+    found = None
+    matched = []
+    missing = []
+    for word, prefix, forms in terms:
+        if prefix in text:
+            if found is None:
+                found = set(text.translate(_SEPARATORS).split())
+            if not forms.isdisjoint(found):
+                matched.append(word)
+                continue
+        missing.append(word)
+    # As before key terms were compiled: a reference with fewer than MIN_MATCHES terms never passes
+    return Grade(len(matched) >= MIN_MATCHES, matched, missing)
+
+
+def grade(question, user_answer):
+    """ Grade one answer to a question dict ({'type', 'answer', ...}).
+
+    An answer of the wrong shape (anything but a string for single and open
+    questions, or a list of strings for multiple choice) is graded incorrect.
+    """
+    correct = question['answer']
+    if question['type'] == 'single':
+        ok = isinstance(user_answer, str) and user_answer.strip().lower() == correct.strip().lower()
+        return Grade(ok, [], [])
+    if question['type'] == 'multiple':
+        ok = (isinstance(user_answer, (list, tuple)) and all(isinstance(a, str) for a in user_answer)
+              and set(user_answer) == set(correct))
+        return Grade(ok, [], [])
+    if question['type'] == 'open':
+        return grade_open(correct, user_answer if isinstance(user_answer, str) else '')
+    return Grade(False, [], [])
+
+
+def grade_many(submissions):
+    """ Grade an iterable of (question, user_answer) pairs; returns a list of Grade, in input order.
+
+    Open answers are grouped by reference answer, so each compiled key-term
+    set is looked up once per batch rather than once per submission.
+    """
+    submissions = list(submissions)
+    grades = [None] * len(submissions)
+    by_reference = {}
+    for i, (question, answer) in enumerate(submissions):
+        if question['type'] == 'open':
+            by_reference.setdefault(question['answer'], []).append(i)
+        else:
+            grades[i] = grade(question, answer)
+    for reference, indices in by_reference.items():
+        terms = compile_key_terms(reference)
+        for i in indices:
+            answer = submissions[i][1]
+            grades[i] = _grade_terms(terms, answer if isinstance(answer, str) else '')
+    return grades
@@ -2,9 +2,11 @@ import tkinter as tk
 from tkinter import messagebox
 from user import User
 from quiz import Quiz
-import threading
-import time
-import winsound
+from grading import grade_open
+from logger import log_error
+from scheduler import get_scheduler
+from dbworker import get_db_worker
+from collections import deque
 
 THEMES = {
     'light': {'bg': '#f7fbff', 'fg': '#003366', 'button': '#b3e6cc', 'accent': '#0059b3'},
@@ -23,23 +25,45 @@ class LoginScreen(tk.Frame):
         tk.Label(self, text="Password:", bg='#e6f2ff').pack()
         self.password_entry = tk.Entry(self, show="*")
         self.password_entry.pack(pady=2)
-        tk.Button(self, text="Login", command=self.try_login, bg='#b3e6cc', fg='#003300').pack(pady=8)
+        self.login_btn = tk.Button(self, text="Login", command=self.try_login, bg='#b3e6cc', fg='#003300')
+        self.login_btn.pack(pady=8)
         tk.Button(self, text="Register", command=self.on_register, bg='#ffe680', fg='#665c00').pack()
+        self.status_label = tk.Label(self, text="", bg='#e6f2ff', fg='#0059b3')
+        self.status_label.pack(pady=5)
         self.password_entry.bind('<Return>', lambda event: self.try_login())
         self.username_entry.bind('<Return>', lambda event: self.try_login())
 
+    def on_hide(self):
+        # The screen is reused: never leave a password behind
+        self.password_entry.delete(0, tk.END)
+
     def try_login(self):
         username = self.username_entry.get().strip()
         password = self.password_entry.get().strip()
         if not username or not password:
             messagebox.showwarning("Input Error", "Please enter both username and password.")
             return
-        success, result = User.login(username, password)
+        if str(self.login_btn['state']) == tk.DISABLED:
+            return  # a login is already running
+        self.login_btn.config(state=tk.DISABLED)
+        self.status_label.config(text="Signing in...")
+        get_db_worker(self).submit(lambda: User.login(username, password), self.login_done, self.login_failed, owner=self)
+
+    def login_done(self, outcome):
+        self.login_btn.config(state=tk.NORMAL)
+        self.status_label.config(text="")
+        success, result = outcome
         if success:
             self.on_login(result)
         else:
             messagebox.showerror("Login Failed", result)
 
+    def login_failed(self, error):
+        self.login_btn.config(state=tk.NORMAL)
+        self.status_label.config(text="")
+        log_error(f"Database error in login: {error}")
+        messagebox.showerror("Login Failed", "Could not reach the database. See log.txt for details.")
+
 class RegisterScreen(tk.Frame):
     def __init__(self, master, on_register_success, on_back):
         super().__init__(master, bg='#e6f2ff')
@@ -58,8 +82,15 @@ class RegisterScreen(tk.Frame):
         tk.Label(self, text="Confirm Password:", bg='#e6f2ff').pack()
         self.confirm_entry = tk.Entry(self, show="*")
         self.confirm_entry.pack(pady=2)
-        tk.Button(self, text="Register", command=self.try_register, bg='#b3e6cc', fg='#003300').pack(pady=8)
+        self.register_btn = tk.Button(self, text="Register", command=self.try_register, bg='#b3e6cc', fg='#003300')
+        self.register_btn.pack(pady=8)
         tk.Button(self, text="Back to Login", command=self.on_back, bg='#ffe680', fg='#665c00').pack()
+        self.status_label = tk.Label(self, text="", bg='#e6f2ff', fg='#0059b3')
+        self.status_label.pack(pady=5)
+
+    def on_hide(self):
+        for entry in (self.username_entry, self.email_entry, self.password_entry, self.confirm_entry):
+            entry.delete(0, tk.END)
 
     def try_register(self):
         username = self.username_entry.get().strip()
@@ -72,14 +103,33 @@ class RegisterScreen(tk.Frame):
         if password != confirm:
             messagebox.showwarning("Input Error", "Passwords do not match.")
             return
-        success, result = User.register(username, email, password)
+        if str(self.register_btn['state']) == tk.DISABLED:
+            return  # a registration is already running
+
+        def register():
+            success, result = User.register(username, email, password)
+            return success, result, User.get_user(username) if success else None
+
+        self.register_btn.config(state=tk.DISABLED)
+        self.status_label.config(text="Creating account...")
+        get_db_worker(self).submit(register, self.register_done, self.register_failed, owner=self)
+
+    def register_done(self, outcome):
+        self.register_btn.config(state=tk.NORMAL)
+        self.status_label.config(text="")
+        success, result, user = outcome
         if success:
             messagebox.showinfo("Registration Successful", result)
-            user = User.get_user(username)
             self.on_register_success(user)
         else:
             messagebox.showerror("Registration Failed", result)
 
+    def register_failed(self, error):
+        self.register_btn.config(state=tk.NORMAL)
+        self.status_label.config(text="")
+        log_error(f"Database error in registration: {error}")
+        messagebox.showerror("Registration Failed", "Could not reach the database. See log.txt for details.")
+
 class MainMenuScreen(tk.Frame):
     def __init__(self, master, user, on_start_quiz, on_show_records, on_show_achievements, on_logout, on_show_stats, on_show_ranking, on_import, on_export, on_learning_mode, on_theme):
         super().__init__(master, bg=THEMES[master.theme]['bg'])
@@ -100,6 +150,7 @@ class MainMenuScreen(tk.Frame):
         tk.Button(self, text="Start Quiz", command=self.choose_quiz_type, bg=THEMES[master.theme]['button'], fg=THEMES[master.theme]['fg'], font=("Arial", 12, "bold")).pack(pady=8)
         tk.Button(self, text="Learning Mode", command=self.on_learning_mode, bg=THEMES[master.theme]['button'], fg=THEMES[master.theme]['accent'], font=("Arial", 12, "bold")).pack(pady=8)
         tk.Button(self, text="Show Records", command=self.show_records, bg='#ffe680', fg='#665c00', font=("Arial", 12, "bold")).pack(pady=8)
+        tk.Button(self, text="Progress Chart", command=lambda: ProgressWindow(self, self.user), bg=THEMES[master.theme]['bg'], fg=THEMES[master.theme]['accent'], font=("Arial", 12, "bold")).pack(pady=8)
         tk.Button(self, text="Show Achievements", command=self.show_achievements, bg=THEMES[master.theme]['bg'], fg=THEMES[master.theme]['accent'], font=("Arial", 12, "bold")).pack(pady=8)
         tk.Button(self, text="Statistics", command=self.show_stats, bg=THEMES[master.theme]['bg'], fg=THEMES[master.theme]['accent'], font=("Arial", 12, "bold")).pack(pady=8)
         tk.Button(self, text="Ranking", command=self.show_ranking, bg=THEMES[master.theme]['bg'], fg=THEMES[master.theme]['accent'], font=("Arial", 12, "bold")).pack(pady=8)
@@ -115,6 +166,7 @@ class MainMenuScreen(tk.Frame):
         scrollbar = tk.Scrollbar(frame, command=self.info_box.yview)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.info_box.config(yscrollcommand=scrollbar.set)
+        self.request = 0
         self.show_info("Welcome to the Programming Quiz! Use the menu to start.")
 
     def fade_in(self, label, step=0):
@@ -140,13 +192,42 @@ class MainMenuScreen(tk.Frame):
             self.info_btn_frame.destroy()
             self.info_btn_frame = None
 
+    def load(self, fn, show, what):
+        """ Run fn() on the DB worker and pass its result to show(); only the latest request is shown """
+        self.request += 1
+        request = self.request
+        self.clear_info_buttons()
+        self.show_info(f"Loading {what}...")
+
+        def done(result):
+            if request == self.request:
+                show(result)
+
+        def failed(error):
+            log_error(f"Database error loading {what}: {error}")
+            if request == self.request:
+                self.show_info(f"Could not load {what}. See log.txt for details.")
+
+        get_db_worker(self).submit(fn, done, failed, owner=self)
+
     def show_records(self):
-        records = self.user.get_records()
+        self.load(self.user.get_records, self.show_records_loaded, "records")
+
+    def show_records_loaded(self, records):
         msg = '\n'.join([f"{t} - {p} pts ({d})" for t, p, d in records]) or "No records yet."
         self.show_info(msg)
+        self.clear_info_buttons()
+        if records:
+            self.info_btn_frame = tk.Frame(self)
+            self.info_btn_frame.pack(pady=5)
+            for label, path in [("Export JSONL", f"results_{self.user.username}.jsonl"), ("Export CSV", f"results_{self.user.username}.csv")]:
+                tk.Button(self.info_btn_frame, text=label, font=("Arial", 12),
+                          command=lambda p=path: ExportProgress(self, p, user_id=self.user.id)).pack(side=tk.LEFT, padx=10)
 
     def show_achievements(self):
-        achievements = self.user.get_achievements()
+        self.load(self.user.get_achievements, self.show_achievements_loaded, "achievements")
+
+    def show_achievements_loaded(self, achievements):
         if not achievements:
             msg = "No achievements yet."
         else:
@@ -154,20 +235,60 @@ class MainMenuScreen(tk.Frame):
         self.show_info(msg)
 
     def show_stats(self):
-        stats = self.user.get_stats()
+        self.load(lambda: (self.user.get_stats(), self.user.get_type_stats()), self.show_stats_loaded, "statistics")
+
+    def show_stats_loaded(self, result):
+        stats, type_stats = result
         msg = f"Quizzes taken: {stats['quizzes']}\nBest score: {stats['best']}\nAverage: {stats['avg']}"
+        if stats['last_played']:
+            msg += f"\nLast played: {stats['last_played']}"
+        for t, s in sorted(type_stats.items()):
+            msg += f"\n  {t}: {s['quizzes']} quizzes, best {s['best']}, average {s['avg']}"
         self.show_info(msg)
 
     def show_ranking(self):
-        ranking = self.user.get_ranking()
+        self.load(lambda: (self.user.get_ranking(), self.user.get_rank()), self.show_ranking_loaded, "ranking")
+
+    def show_ranking_loaded(self, result):
+        ranking, rank = result
         msg = '\n'.join([f"{i+1}. {u} - {p} pts" for i, (u, p) in enumerate(ranking)]) or "No ranking yet."
+        if rank:
+            msg += f"\n\nYour rank: {rank[0]} ({rank[1]} pts)"
         self.show_info(msg)
 
     def show_import(self):
-        self.show_info("Import Questions: (functionality to be implemented)")
+        from tkinter import filedialog
+        from question_io import import_bank
+        path = filedialog.askopenfilename(title="Import Questions", filetypes=[("Question bank (JSONL)", "*.jsonl"), ("All files", "*.*")])
+        if not path:
+            return
+        # Dry run first: show what would change and let the user confirm
+        diff = []
+
+        def dry_run():
+            with open(path, encoding='utf-8') as f:
+                return import_bank(f, dry_run=True, on_diff=lambda status, line, detail: len(diff) < 200 and diff.append((line, status, detail)))
+
+        self.load(dry_run, lambda stats: self.show_import_diff(path, stats, diff), path)
+
+    def show_import_diff(self, path, stats, diff):
+        lines = [f"{'+' if status == 'added' else '~' if status == 'changed' else '!'} line {line}: {detail}" for line, status, detail in sorted(diff)]
+        more = stats['added'] + stats['changed'] + stats['invalid'] - len(diff)
+        if more > 0:
+            lines.append(f"... and {more} more")
+        self.show_info(f"{path}: {stats['added']} new, {stats['changed']} changed, {stats['unchanged']} unchanged, {stats['invalid']} invalid\n\n" + '\n'.join(lines))
+        self.clear_info_buttons()
+        if stats['added'] or stats['changed']:
+            self.info_btn_frame = tk.Frame(self)
+            self.info_btn_frame.pack(pady=5)
+            tk.Button(self.info_btn_frame, text="Apply Import", font=("Arial", 12), command=lambda: self.on_import(path)).pack(side=tk.LEFT, padx=10)
+            tk.Button(self.info_btn_frame, text="Cancel", font=("Arial", 12), command=self.clear_info_buttons).pack(side=tk.LEFT, padx=10)
 
     def show_export(self):
-        self.show_info("Export Questions: (functionality to be implemented)")
+        from tkinter import filedialog
+        path = filedialog.asksaveasfilename(title="Export Questions", defaultextension=".jsonl", filetypes=[("Question bank (JSONL)", "*.jsonl")])
+        if path:
+            self.on_export(path)
 
     def show_info(self, msg):
         self.info_box.config(state=tk.NORMAL)
@@ -176,10 +297,144 @@ class MainMenuScreen(tk.Frame):
         self.info_box.config(state=tk.DISABLED)
         self.info_box.see(tk.END)
 
+class MessageLog(tk.Frame):
+    """ Scrollable message view that keeps only the last max_lines lines.
+
+    The lines live in a ring buffer (deque) and the Text widget is edited
+    incrementally: new lines are appended and the oldest deleted, so every
+    message costs the same however long the session runs.
+    """
+    def __init__(self, master, max_lines=200, bg='#f7fbff', fg='#003366', height=10, width=120):
+        super().__init__(master)
+        self.lines = deque(maxlen=max_lines)
+        self.text = tk.Text(self, height=height, width=width, bg=bg, fg=fg, state=tk.DISABLED, wrap=tk.WORD)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = tk.Scrollbar(self, command=self.text.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text.config(yscrollcommand=scrollbar.set)
+
+    def add(self, msg):
+        new = msg.split('\n')[-self.lines.maxlen:]
+        # Only follow the end if the user has not scrolled up to read something
+        follow = self.text.yview()[1] >= 1.0
+        dropped = max(len(self.lines) + len(new) - self.lines.maxlen, 0)
+        self.lines.extend(new)
+        self.text.config(state=tk.NORMAL)
+        self.text.insert(tk.END, ''.join(line + '\n' for line in new))
+        if dropped:
+            self.text.delete('1.0', f'{dropped + 1}.0')
+        self.text.config(state=tk.DISABLED)
+        if follow:
+            self.text.see(tk.END)
+
+    def clear(self):
+        self.lines.clear()
+        self.text.config(state=tk.NORMAL)
+        self.text.delete('1.0', tk.END)
+        self.text.config(state=tk.DISABLED)
+
+class IncorrectAnswersReview(tk.Toplevel):
+    """ Paginated list of (number, question, correct answer) entries; one page of labels reused across pages """
+    PAGE_SIZE = 10
+
+    def __init__(self, master, entries, page_size=PAGE_SIZE):
+        super().__init__(master, bg='#f7fbff')
+        self.title("Review Incorrect Answers")
+        self.entries = entries
+        self.page_size = page_size
+        self.page = 0
+        self.pages = max((len(entries) + page_size - 1) // page_size, 1)
+        self.rows = []
+        for _ in range(page_size):
+            question = tk.Label(self, font=("Arial", 11, "bold"), bg='#f7fbff', fg='#003366', wraplength=800, justify='left', anchor='w')
+            answer = tk.Label(self, font=("Arial", 11), bg='#f7fbff', fg='#006633', wraplength=800, justify='left', anchor='w')
+            question.pack(fill='x', padx=15, pady=(6, 0))
+            answer.pack(fill='x', padx=30)
+            self.rows.append((question, answer))
+        nav = tk.Frame(self, bg='#f7fbff')
+        nav.pack(pady=10)
+        self.prev_btn = tk.Button(nav, text="< Previous", command=lambda: self.show_page(self.page - 1))
+        self.prev_btn.pack(side=tk.LEFT, padx=5)
+        self.page_label = tk.Label(nav, bg='#f7fbff', fg='#003366')
+        self.page_label.pack(side=tk.LEFT, padx=10)
+        self.next_btn = tk.Button(nav, text="Next >", command=lambda: self.show_page(self.page + 1))
+        self.next_btn.pack(side=tk.LEFT, padx=5)
+        tk.Button(self, text="Close", command=self.destroy, bg='#b3e6cc', fg='#003300').pack(pady=(0, 10))
+        self.show_page(0)
+
+    def show_page(self, page):
+        self.page = min(max(page, 0), self.pages - 1)
+        visible = self.entries[self.page * self.page_size:(self.page + 1) * self.page_size]
+        for i, (question, answer) in enumerate(self.rows):
+            if i < len(visible):
+                num, qtext, ans = visible[i]
+                question.config(text=f"Q{num}: {qtext}")
+                answer.config(text=f"Correct answer: {', '.join(ans) if isinstance(ans, list) else ans}")
+            else:
+                question.config(text='')
+                answer.config(text='')
+        self.page_label.config(text=f"Page {self.page + 1} of {self.pages} ({len(self.entries)} incorrect)")
+        self.prev_btn.config(state=tk.NORMAL if self.page > 0 else tk.DISABLED)
+        self.next_btn.config(state=tk.NORMAL if self.page < self.pages - 1 else tk.DISABLED)
+
+class OptionPool:
+    """ Radio/check button rows for choice questions, created once and reconfigured in place per question """
+    def __init__(self, parent, bg):
+        self.parent = parent
+        self.bg = bg
+        self.choice = tk.IntVar(value=-1)  # index picked in a single-choice question
+        self.rows = []  # (radiobutton, checkbutton, IntVar of the checkbutton)
+        self.options = []
+        self.mode = None
+
+    def show(self, options, mode):
+        """ Show options as radio buttons (mode 'single') or check buttons ('multiple') """
+        while len(self.rows) < len(options):
+            i = len(self.rows)
+            var = tk.IntVar()
+            self.rows.append((tk.Radiobutton(self.parent, variable=self.choice, value=i, bg=self.bg, anchor='w'),
+                              tk.Checkbutton(self.parent, variable=var, bg=self.bg, anchor='w'), var))
+        self.choice.set(-1)
+        for i, (radio, check, var) in enumerate(self.rows):
+            var.set(0)
+            shown, hidden = (radio, check) if mode == 'single' else (check, radio)
+            hidden.pack_forget()
+            if i < len(options):
+                shown.config(text=options[i], state=tk.NORMAL)
+                shown.pack(fill='x', padx=10, pady=2)
+            else:
+                shown.pack_forget()
+        self.options = list(options)
+        self.mode = mode
+
+    def hide(self):
+        for radio, check, var in self.rows:
+            radio.pack_forget()
+            check.pack_forget()
+        self.options = []
+        self.mode = None
+
+    def selected(self):
+        if self.mode == 'single':
+            i = self.choice.get()
+            return [self.options[i]] if 0 <= i < len(self.options) else []
+        return [opt for opt, (radio, check, var) in zip(self.options, self.rows) if var.get()]
+
+    def remove(self, options):
+        """ Grey out and deselect the given options (50/50) """
+        for i, opt in enumerate(self.options):
+            if opt in options:
+                radio, check, var = self.rows[i]
+                radio.config(state=tk.DISABLED)
+                check.config(state=tk.DISABLED)
+                var.set(0)
+                if self.choice.get() == i:
+                    self.choice.set(-1)
+
 class QuizScreen(tk.Frame):
+    """ Built once per app and reused: start() begins a new quiz, questions reconfigure pooled widgets """
     def __init__(self, master, quiz, on_finish):
         super().__init__(master, bg='#f7fbff')
-        self.quiz = quiz
         self.on_finish = on_finish
         self.timer_label = tk.Label(self, text="", font=("Arial", 14, "bold"), bg='#f7fbff', fg='#990000')
         self.timer_label.pack(pady=5)
@@ -189,6 +444,7 @@ class QuizScreen(tk.Frame):
         self.question_label.pack(pady=10)
         self.options_frame = tk.Frame(self, bg='#f7fbff')
         self.options_frame.pack(pady=5)
+        self.options = OptionPool(self.options_frame, '#f7fbff')
         self.answer_entry = tk.Entry(self, width=70)
         self.lifeline_frame = tk.Frame(self, bg='#f7fbff')
         self.lifeline_frame.pack(pady=10)
@@ -206,52 +462,49 @@ class QuizScreen(tk.Frame):
         self.return_btn.pack(pady=5)
         self.time_limit = 45
         self.time_left = self.time_limit
-        self.timer_running = False
-        self.time_up_shown = False
-        self.timer_start = None
-        frame = tk.Frame(self)
-        frame.pack(pady=10, fill=tk.BOTH, expand=True)
-        self.message_box = tk.Text(frame, height=10, width=120, bg='#f7fbff', fg='#003366', state=tk.DISABLED, wrap=tk.WORD)
-        self.message_box.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar = tk.Scrollbar(frame, command=self.message_box.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.message_box.config(yscrollcommand=scrollbar.set)
+        # One shared after() chain drives every countdown; ours is cancelled on navigate, hide and destroy
+        self.scheduler = get_scheduler(self)
+        self.countdown = None
+        self.bind('<Destroy>', self.on_destroy)
+        self.review_btn = tk.Button(self, text="Review Incorrect Answers", command=lambda: IncorrectAnswersReview(self, self.incorrect_answers), bg='#ffe680', fg='#665c00', font=("Arial", 11, "bold"))
+        self.message_log = MessageLog(self, max_lines=200)
+        self.message_log.pack(pady=10, fill=tk.BOTH, expand=True)
+        self.saved_quiz = None
+        self.start(quiz)
+
+    def start(self, quiz):
+        """ Begin a new quiz, restoring the widgets the previous results view hid """
+        self.quiz = quiz
         self.incorrect_answers = []
+        for btn in (self.fifty_btn, self.hint_btn, self.skip_btn):
+            btn.config(state=tk.NORMAL)
+        self.timer_label.pack(pady=5, before=self.counter_label)
+        for widget, pady in ((self.lifeline_frame, 10), (self.submit_button, 10), (self.prev_btn, 5)):
+            widget.pack(pady=pady, before=self.return_btn)
+        self.return_btn.pack_configure(pady=5)
+        self.review_btn.pack_forget()
         self.show_question()
 
     def show_question(self):
-        self.clear_options()
         self.clear_messages()
-        self.time_up_shown = False
+        self.scheduler.cancel(self.countdown)
+        self.countdown = None
         if self.quiz.current_question >= len(self.quiz.questions):
             self.show_results()
             return
         q = self.quiz.questions[self.quiz.current_question]
         self.counter_label.config(text=f"Question {self.quiz.current_question+1} / {len(self.quiz.questions)}")
         self.question_label.config(text=f"Q{self.quiz.current_question+1}: {q['question']}")
-        self.time_left = self.time_limit
-        self.timer_start = time.time()
-        self.update_timer()
-        if q['type'] == 'single':
-            self.vars = []
-            for i, opt in enumerate(q['options']):
-                var = tk.IntVar()
-                rb = tk.Radiobutton(self.options_frame, text=opt, variable=var, value=1, bg='#f7fbff', anchor='w')
-                rb.pack(fill='x', padx=10, pady=2)
-                self.vars.append((var, opt))
-            self.answer_entry.pack_forget()
-        elif q['type'] == 'multiple':
-            self.vars = []
-            for i, opt in enumerate(q['options']):
-                var = tk.IntVar()
-                cb = tk.Checkbutton(self.options_frame, text=opt, variable=var, bg='#f7fbff', anchor='w')
-                cb.pack(fill='x', padx=10, pady=2)
-                self.vars.append((var, opt))
+        self.countdown = self.scheduler.start(self.time_limit, self.show_time_left, self.time_up)
+        if q['type'] in ('single', 'multiple'):
+            self.options.show(q['options'], q['type'])
             self.answer_entry.pack_forget()
         elif q['type'] == 'open':
-            self.answer_entry.pack(pady=10)
+            self.options.hide()
+            self.answer_entry.delete(0, tk.END)
+            self.answer_entry.pack(pady=10, after=self.options_frame)
         else:
-            self.answer_entry.pack_forget()
+            self.clear_options()
         self.add_message("--- New question ---")
         # Dodaj domyślny hint jeśli nie ma
         if 'hint' in q and q['hint']:
@@ -260,25 +513,22 @@ class QuizScreen(tk.Frame):
             self.add_message("Hint: Think carefully and use your knowledge!")
 
     def clear_options(self):
-        for widget in self.options_frame.winfo_children():
-            widget.destroy()
+        self.options.hide()
         self.answer_entry.pack_forget()
 
     def clear_messages(self):
-        self.message_box.config(state=tk.NORMAL)
-        self.message_box.delete(1.0, tk.END)
-        self.message_box.config(state=tk.DISABLED)
+        self.message_log.clear()
 
     def submit_answer(self):
         q = self.quiz.questions[self.quiz.current_question]
         if q['type'] == 'single':
-            selected = [opt for var, opt in self.vars if var.get() == 1]
+            selected = self.options.selected()
             if not selected:
                 self.add_message("Please select an answer.")
                 return
             user_answer = selected[0]
         elif q['type'] == 'multiple':
-            selected = [opt for var, opt in self.vars if var.get() == 1]
+            selected = self.options.selected()
             if not selected:
                 self.add_message("Please select at least one answer.")
                 return
@@ -290,35 +540,41 @@ class QuizScreen(tk.Frame):
                 return
         else:
             user_answer = None
-        correct = self.quiz.check_answer(user_answer)
-        if correct:
+        result = self.quiz.grade_answer(user_answer)
+        if q['type'] == 'open':
+            self.add_message(f"Key terms found: {', '.join(result.matched) or 'none'}")
+        self.quiz.record('correct' if result.correct else 'incorrect')
+        if result.correct:
             self.add_message("[CORRECT] Your answer is correct!")
-            self.quiz.points += 1
         else:
             self.add_message(f"[INCORRECT] Your answer is incorrect. Correct answer: {q['answer']}")
             self.incorrect_answers.append((self.quiz.current_question+1, q['question'], q['answer']))
         self.quiz.current_question += 1
         self.show_question()
 
-    def update_timer(self):
-        elapsed = int(time.time() - self.timer_start) if self.timer_start else 0
-        self.time_left = max(self.time_limit - elapsed, 0)
-        self.timer_label.config(text=f"Time left: {self.time_left}s")
-        if self.time_left > 0:
-            self.after(1000, self.update_timer)
-        else:
-            if not self.time_up_shown:
-                self.add_message("Time's up! You ran out of time for this question.")
-                self.time_up_shown = True
-                self.incorrect_answers.append((self.quiz.current_question+1, self.quiz.questions[self.quiz.current_question]['question'], self.quiz.questions[self.quiz.current_question]['answer']))
-                self.quiz.current_question += 1
-                self.show_question()
+    def show_time_left(self, seconds):
+        self.time_left = seconds
+        self.timer_label.config(text=f"Time left: {seconds}s")
+
+    def time_up(self):
+        self.countdown = None
+        self.add_message("Time's up! You ran out of time for this question.")
+        q = self.quiz.questions[self.quiz.current_question]
+        self.incorrect_answers.append((self.quiz.current_question+1, q['question'], q['answer']))
+        self.quiz.record('timeout')
+        self.quiz.current_question += 1
+        self.show_question()
+
+    def on_hide(self):
+        self.scheduler.cancel(self.countdown)
+        self.countdown = None
+
+    def on_destroy(self, event):
+        if event.widget is self:
+            self.on_hide()
 
     def add_message(self, msg):
-        self.message_box.config(state=tk.NORMAL)
-        self.message_box.insert(tk.END, msg + '\n')
-        self.message_box.config(state=tk.DISABLED)
-        self.message_box.see(tk.END)
+        self.message_log.add(msg)
 
     def use_fifty(self):
         if not self.quiz.lifelines['fifty_fifty']:
@@ -334,9 +590,7 @@ class QuizScreen(tk.Frame):
         if len(to_remove) > 1:
             import random
             remove = random.sample(to_remove, len(to_remove)-1)
-            for var, opt in self.vars:
-                if opt in remove:
-                    var.set(0)
+            self.options.remove(remove)
         self.quiz.lifelines['fifty_fifty'] = False
         self.fifty_btn.config(state=tk.DISABLED)
         self.add_message("50/50 used.")
@@ -355,7 +609,7 @@ class QuizScreen(tk.Frame):
         if not self.quiz.lifelines['skip']:
             self.add_message("You have already used Skip.")
             return
-        self.quiz.current_question += 1
+        self.quiz.use_skip()
         self.quiz.lifelines['skip'] = False
         self.skip_btn.config(state=tk.DISABLED)
         self.add_message("Question skipped.")
@@ -373,9 +627,9 @@ class QuizScreen(tk.Frame):
         self.question_label.config(text=f"Your score: {self.quiz.points} / {len(self.quiz.questions)}")
         self.add_message(f"Quiz completed! Your score: {self.quiz.points} / {len(self.quiz.questions)}")
         if self.incorrect_answers:
-            self.add_message("Incorrect answers:")
-            for num, qtext, ans in self.incorrect_answers:
-                self.add_message(f"Q{num}: {qtext}\nCorrect answer: {ans}")
+            # The full list goes to the paginated review instead of the message log
+            self.add_message(f"{len(self.incorrect_answers)} incorrect answers - use Review Incorrect Answers to go through them.")
+            self.review_btn.pack(pady=5, before=self.return_btn)
         else:
             self.add_message("All answers were correct!")
         self.submit_button.pack_forget()
@@ -383,6 +637,27 @@ class QuizScreen(tk.Frame):
         self.timer_label.pack_forget()
         self.prev_btn.pack_forget()
         self.return_btn.pack(pady=20)
+        if self.quiz.user is not None and self.saved_quiz is not self.quiz:
+            # One transaction records everything and returns what the summary needs
+            self.saved_quiz = quiz = self.quiz
+            self.add_message("Saving your result...")
+            get_db_worker(self).submit(quiz.finish, lambda summary: quiz is self.quiz and self.show_summary(summary),
+                                       self.save_failed, owner=self)
+
+    def show_summary(self, summary):
+        stats = summary['stats']
+        self.add_message(f"Result saved. Quizzes taken: {stats['quizzes']}, best score: {stats['best']}, average: {stats['avg']}")
+        if summary['type_stats']:
+            s = summary['type_stats']
+            self.add_message(f"{self.quiz.quiz_type}: {s['quizzes']} quizzes, best {s['best']}, average {s['avg']}")
+        if summary['rank']:
+            self.add_message(f"Your rank: {summary['rank'][0]} ({summary['rank'][1]} pts)")
+        for name, description in summary['achievements']:
+            self.add_message(f"Achievement unlocked: {name} - {description}")
+
+    def save_failed(self, error):
+        log_error(f"Database error saving quiz result: {error}")
+        self.add_message("Could not save your result. See log.txt for details.")
 
 class ResultsScreen(tk.Frame):
     def __init__(self, master, quiz, on_return):
@@ -407,6 +682,98 @@ class AchievementsScreen(tk.Frame):
                 tk.Label(self, text=desc, font=("Arial", 11), bg='#f7fbff', fg='#003366').pack(pady=1)
         tk.Button(self, text="Return to Menu", command=self.on_return, bg='#b3e6cc', fg='#003300', font=("Arial", 12, "bold")).pack(pady=20) 
 
+class ExportProgress(tk.Toplevel):
+    """ Runs results_io.export_results on the DB worker and shows its progress """
+    POLL_MS = 100
+
+    def __init__(self, master, path, **filters):
+        super().__init__(master, bg='#f7fbff')
+        from tkinter import ttk
+        self.title("Exporting Results")
+        self.path = path
+        self.filters = filters
+        self.total = None
+        self.done = 0
+        self.result = None
+        self.error = None
+        self.label = tk.Label(self, text=f"Exporting results to {path}...", font=("Arial", 11), bg='#f7fbff', fg='#003366')
+        self.label.pack(padx=20, pady=10)
+        self.bar = ttk.Progressbar(self, length=360)
+        self.bar.pack(padx=20, pady=10)
+        get_db_worker(self).submit(self.run)
+        self.after(self.POLL_MS, self.poll)
+
+    def run(self):
+        """ DB worker thread: only writes plain attributes, the Tk thread polls them """
+        from results_io import count_results, export_results
+        try:
+            self.total = count_results(**self.filters)
+            self.result = export_results(self.path, progress=self.set_done, **self.filters)
+        except Exception as e:
+            self.error = e
+
+    def set_done(self, count):
+        self.done = count
+
+    def poll(self):
+        if self.total is not None:
+            self.bar.config(maximum=max(self.total, 1), value=self.done)
+            self.label.config(text=f"Exporting results to {self.path}: {self.done}/{self.total}")
+        if self.error is not None:
+            log_error(f"Error exporting results: {self.error}")
+            self.destroy()
+            messagebox.showerror("Export Error", "Could not export results. See log.txt for details.")
+        elif self.result is not None:
+            self.destroy()
+            messagebox.showinfo("Export", f"{self.result} results exported to {self.path}")
+        else:
+            self.after(self.POLL_MS, self.poll)
+
+class ProgressWindow(tk.Toplevel):
+    """ Progress chart of one user; aggregation and rendering run on the DB worker """
+
+    def __init__(self, master, user):
+        super().__init__(master, bg='#f7fbff')
+        self.title("Learning Progress")
+        self.user = user
+        self.bucket = tk.StringVar(value='week')
+        self.quiz_type = tk.StringVar(value='all')
+        controls = tk.Frame(self, bg='#f7fbff')
+        controls.pack(pady=8)
+        tk.Label(controls, text="Group by:", bg='#f7fbff', fg='#003366').pack(side=tk.LEFT)
+        tk.OptionMenu(controls, self.bucket, 'day', 'week', 'month', command=lambda _: self.refresh()).pack(side=tk.LEFT, padx=5)
+        tk.Label(controls, text="Quiz type:", bg='#f7fbff', fg='#003366').pack(side=tk.LEFT, padx=(15, 0))
+        tk.OptionMenu(controls, self.quiz_type, 'all', 'single', 'multiple', 'open', command=lambda _: self.refresh()).pack(side=tk.LEFT, padx=5)
+        self.chart = tk.Label(self, text="Loading...", font=("Arial", 12), bg='#f7fbff', fg='#003366', width=90, height=22)
+        self.chart.pack(padx=10, pady=10)
+        self.image = None
+        self.request = 0
+        self.refresh()
+
+    def refresh(self):
+        self.request += 1
+        request, bucket = self.request, self.bucket.get()
+        quiz_type = None if self.quiz_type.get() == 'all' else self.quiz_type.get()
+        self.chart.config(image='', text="Loading...")
+
+        def work():
+            from progress import progress_chart
+            return progress_chart(self.user, bucket, quiz_type)
+
+        get_db_worker(self).submit(work, lambda png: self.show_chart(request, png), lambda e: self.show_error(request, e), owner=self)
+
+    def show_chart(self, request, png):
+        if request != self.request:
+            return  # superseded by a newer selection
+        import base64
+        self.image = tk.PhotoImage(data=base64.b64encode(png))
+        self.chart.config(image=self.image, text='', width=self.image.width(), height=self.image.height())
+
+    def show_error(self, request, error):
+        log_error(f"Database or plot error in show_progress: {error}")
+        if request == self.request:
+            self.chart.config(text="Could not display progress. See log.txt for details.")
+
 class LearningModeScreen(tk.Frame):
     def __init__(self, master, questions, on_return):
         super().__init__(master, bg=THEMES[master.theme]['bg'])
@@ -414,7 +781,6 @@ class LearningModeScreen(tk.Frame):
         self.on_return = on_return
         self.current = 0
         self.errors = {}
-        self.messages = []
         self.label = tk.Label(self, text="Learning Mode", font=("Arial", 16, "bold"), bg=THEMES[master.theme]['bg'], fg=THEMES[master.theme]['accent'])
         self.label.pack(pady=10)
         self.question_label = tk.Label(self, text="", font=("Arial", 14), wraplength=900, bg=THEMES[master.theme]['bg'], fg=THEMES[master.theme]['fg'])
@@ -429,17 +795,24 @@ class LearningModeScreen(tk.Frame):
         self.next_btn.pack(pady=5)
         self.stats_label = tk.Label(self, text="", font=("Arial", 11), bg=THEMES[master.theme]['bg'], fg=THEMES[master.theme]['accent'])
         self.stats_label.pack(pady=10)
-        frame = tk.Frame(self)
-        frame.pack(pady=10, fill=tk.BOTH, expand=True)
-        self.message_box = tk.Text(frame, height=10, width=120, bg=THEMES[master.theme]['bg'], fg=THEMES[master.theme]['fg'], state=tk.DISABLED, wrap=tk.WORD)
-        self.message_box.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar = tk.Scrollbar(frame, command=self.message_box.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.message_box.config(yscrollcommand=scrollbar.set)
+        self.message_log = MessageLog(self, max_lines=10, bg=THEMES[master.theme]['bg'], fg=THEMES[master.theme]['fg'])
+        self.message_log.pack(pady=10, fill=tk.BOTH, expand=True)
         self.return_btn = tk.Button(self, text="Return to Menu", command=self.on_return, bg='#b3e6cc', fg='#003300', font=("Arial", 11, "bold"))
         self.return_btn.pack(pady=10)
         self.show_q()
 
+    def restart(self):
+        """ Start the session over on this (reused) screen """
+        self.current = 0
+        self.errors = {}
+        self.message_log.clear()
+        if not self.submit_btn.winfo_manager():
+            # The end-of-session view hid these
+            self.answer_entry.pack(pady=5, before=self.next_btn)
+            self.submit_btn.pack(pady=10, before=self.next_btn)
+        self.next_btn.config(text="Next", command=self.next_q)
+        self.show_q()
+
     def next_q(self):
         self.current += 1
         self.show_q()
@@ -461,13 +834,10 @@ class LearningModeScreen(tk.Frame):
         self.add_message(f"--- New question ---")
 
     def add_message(self, msg):
-        self.messages.append(msg)
-        self.message_box.config(state=tk.NORMAL)
-        self.message_box.delete(1.0, tk.END)
-        for m in self.messages[-10:]:
-            self.message_box.insert(tk.END, m + '\n')
-        self.message_box.config(state=tk.DISABLED)
-        self.message_box.see(tk.END)
+        self.message_log.add(msg)
+
+    def clear_messages(self):
+        self.message_log.clear()
 
     def check(self):
         q = self.questions[self.current]
@@ -484,10 +854,7 @@ class LearningModeScreen(tk.Frame):
             user_set = set([a.strip() for a in answer.split(',') if a.strip()])
             is_correct = user_set == correct_set
         elif q['type'] == 'open':
-            correct_answer = q['answer'].lower()
-            key_words = [word for word in correct_answer.split() if len(word) > 3][:5]
-            matches = sum(1 for word in key_words if word in answer)
-            is_correct = matches >= 2
+            is_correct = grade_open(q['answer'], answer).correct
         else:
             is_correct = False
         if is_correct:
@@ -0,0 +1,350 @@
+"""
+Versioned schema migrations.
+
+The schema version is stored in SQLite's PRAGMA user_version. Each migration
+is a (version, description, function) entry in MIGRATIONS; migrate() applies
+every entry newer than the stored version, in order, inside one transaction,
+and then bumps user_version. When the schema is current no DDL runs at all.
+
+To change the schema, append a new migration - never edit one that shipped.
+"""
+import sqlite3
+
+
+def _table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _base_schema(conn):
+    """ Tables created by the original create_database() """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL UNIQUE,
+        email TEXT NOT NULL,
+        password TEXT NOT NULL
+    )""")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS achievements (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        description TEXT,
+        date TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )""")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS questions (
+        id INTEGER PRIMARY KEY,
+        question TEXT NOT NULL,
+        type TEXT NOT NULL,
+        correct_answer TEXT NOT NULL,
+        incorrect_options TEXT
+    )""")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS results (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        points INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )""")
+
+
+def _results_user_id(conn):
+    """ Rebuild pre-account results tables that lack user_id (old rows go to user 1) """
+    if 'user_id' in _table_columns(conn, 'results'):
+        return
+    conn.execute("""
+    CREATE TABLE results_new (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        points INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )""")
+    conn.execute("INSERT INTO results_new (id, user_id, type, points, date) SELECT id, 1, type, points, date FROM results")
+    conn.execute("DROP TABLE results")
+    conn.execute("ALTER TABLE results_new RENAME TO results")
+
+
+def _question_uid_and_meta(conn):
+    """ Stable question ids for upserts, plus a key/value table for bookkeeping """
+    conn.execute("ALTER TABLE questions ADD COLUMN uid TEXT")
+    conn.execute("ALTER TABLE questions ADD COLUMN source TEXT NOT NULL DEFAULT 'seed'")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_uid ON questions (uid)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )""")
+
+
+def _hot_query_indexes(conn):
+    """ Indexes for the per-user, per-type and login lookups; achievements become unique per user """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_results_user_points ON results (user_id, points, type, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_type ON questions (type)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users (email)")
+    conn.execute("DELETE FROM achievements WHERE id NOT IN (SELECT MIN(id) FROM achievements GROUP BY user_id, name)")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_achievements_user_name ON achievements (user_id, name)")
+
+
+def _leaderboard(conn):
+    """ Per-user point totals kept current by triggers on results """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS leaderboard (
+        user_id INTEGER PRIMARY KEY,
+        total_points INTEGER NOT NULL DEFAULT 0,
+        quizzes INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leaderboard_total ON leaderboard (total_points DESC, user_id)")
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_results_leaderboard_insert AFTER INSERT ON results
+    BEGIN
+        INSERT INTO leaderboard (user_id, total_points, quizzes) VALUES (NEW.user_id, NEW.points, 1)
+        ON CONFLICT(user_id) DO UPDATE SET total_points = total_points + excluded.total_points, quizzes = quizzes + 1;
+    END""")
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_results_leaderboard_delete AFTER DELETE ON results
+    BEGIN
+        UPDATE leaderboard SET total_points = total_points - OLD.points, quizzes = quizzes - 1 WHERE user_id = OLD.user_id;
+        DELETE FROM leaderboard WHERE user_id = OLD.user_id AND quizzes <= 0;
+    END""")
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_results_leaderboard_update AFTER UPDATE OF user_id, points ON results
+    BEGIN
+        UPDATE leaderboard SET total_points = total_points - OLD.points, quizzes = quizzes - 1 WHERE user_id = OLD.user_id;
+        DELETE FROM leaderboard WHERE user_id = OLD.user_id AND quizzes <= 0;
+        INSERT INTO leaderboard (user_id, total_points, quizzes) VALUES (NEW.user_id, NEW.points, 1)
+        ON CONFLICT(user_id) DO UPDATE SET total_points = total_points + excluded.total_points, quizzes = quizzes + 1;
+    END""")
+    conn.execute("DELETE FROM leaderboard")
+    conn.execute("INSERT INTO leaderboard (user_id, total_points, quizzes) SELECT user_id, SUM(points), COUNT(*) FROM results GROUP BY user_id")
+
+
+# Shared by migration 6 and database.rebuild_user_stats()
+USER_STATS_FROM_RESULTS = """
+    INSERT INTO user_stats (user_id, quizzes, total_points, best, last_played)
+    SELECT user_id, COUNT(*), SUM(points), MAX(points), MAX(date) FROM results {where} GROUP BY user_id"""
+USER_TYPE_STATS_FROM_RESULTS = """
+    INSERT INTO user_type_stats (user_id, type, quizzes, total_points, best)
+    SELECT user_id, type, COUNT(*), SUM(points), MAX(points) FROM results {where} GROUP BY user_id, type"""
+
+
+def _recompute_stats_sql(row):
+    """ Trigger body that recomputes the aggregates of the user/type in row (OLD or NEW) """
+    return f"""
+        DELETE FROM user_stats WHERE user_id = {row}.user_id;
+        {USER_STATS_FROM_RESULTS.format(where=f"WHERE user_id = {row}.user_id")};
+        DELETE FROM user_type_stats WHERE user_id = {row}.user_id AND type = {row}.type;
+        {USER_TYPE_STATS_FROM_RESULTS.format(where=f"WHERE user_id = {row}.user_id AND type = {row}.type")};"""
+
+
+def _user_stats(conn):
+    """ Per-user and per-user-per-type aggregates kept current by triggers on results """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_id INTEGER PRIMARY KEY,
+        quizzes INTEGER NOT NULL,
+        total_points INTEGER NOT NULL,
+        best INTEGER NOT NULL,
+        last_played TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )""")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_type_stats (
+        user_id INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        quizzes INTEGER NOT NULL,
+        total_points INTEGER NOT NULL,
+        best INTEGER NOT NULL,
+        PRIMARY KEY (user_id, type),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) WITHOUT ROWID""")
+    # Inserts update the aggregates in O(1); deletes and edits (rare) recompute the
+    # affected user from results, which idx_results_user_points keeps cheap.
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_results_stats_insert AFTER INSERT ON results
+    BEGIN
+        INSERT INTO user_stats (user_id, quizzes, total_points, best, last_played)
+        VALUES (NEW.user_id, 1, NEW.points, NEW.points, NEW.date)
+        ON CONFLICT(user_id) DO UPDATE SET
+            quizzes = quizzes + 1,
+            total_points = total_points + excluded.total_points,
+            best = MAX(best, excluded.best),
+            last_played = MAX(COALESCE(last_played, ''), excluded.last_played);
+        INSERT INTO user_type_stats (user_id, type, quizzes, total_points, best)
+        VALUES (NEW.user_id, NEW.type, 1, NEW.points, NEW.points)
+        ON CONFLICT(user_id, type) DO UPDATE SET
+            quizzes = quizzes + 1,
+            total_points = total_points + excluded.total_points,
+            best = MAX(best, excluded.best);
+    END""")
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_results_stats_delete AFTER DELETE ON results
+    BEGIN{_recompute_stats_sql("OLD")}
+    END""")
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_results_stats_update AFTER UPDATE OF user_id, type, points, date ON results
+    BEGIN{_recompute_stats_sql("OLD")}{_recompute_stats_sql("NEW")}
+    END""")
+    conn.execute("DELETE FROM user_stats")
+    conn.execute("DELETE FROM user_type_stats")
+    conn.execute(USER_STATS_FROM_RESULTS.format(where=""))
+    conn.execute(USER_TYPE_STATS_FROM_RESULTS.format(where=""))
+
+
+def _bank_revision(conn):
+    """ Revision counter in meta, bumped by any change to the question bank """
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('bank_revision', 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_questions_revision_{event.lower()} AFTER {event} ON questions
+        BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'bank_revision';
+        END""")
+
+
+def _question_options(conn):
+    """ One row per answer option instead of comma-joined strings in questions """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS question_options (
+        question_id INTEGER NOT NULL,
+        ordinal INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        is_correct INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (question_id, ordinal),
+        FOREIGN KEY (question_id) REFERENCES questions (id) ON DELETE CASCADE
+    ) WITHOUT ROWID""")
+    rows = []
+    updates = []
+    for qid, qtype, correct, incorrect in conn.execute(
+            "SELECT id, type, correct_answer, incorrect_options FROM questions WHERE type IN ('single', 'multiple')"):
+        options = incorrect.split(',') if incorrect else []
+        if qtype == 'single':
+            options.append(correct)
+            answers = {correct}
+        else:
+            answers = {a.strip() for a in correct.split(',')}
+        rows.extend((qid, i, text, int(text in answers)) for i, text in enumerate(options))
+        # correct_answer stays as display text only; the options table is the source of truth
+        updates.append((', '.join(opt for opt in options if opt in answers), qid))
+    conn.executemany("INSERT INTO question_options (question_id, ordinal, text, is_correct) VALUES (?, ?, ?, ?)", rows)
+    conn.executemany("UPDATE questions SET correct_answer=?, incorrect_options=NULL WHERE id=?", updates)
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_question_options_revision_{event.lower()} AFTER {event} ON question_options
+        BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'bank_revision';
+        END""")
+
+
+def _manual_question_uids(conn):
+    """ Give questions added by hand a stable id so they survive export and re-import """
+    conn.execute("UPDATE questions SET uid = 'manual-' || id WHERE uid IS NULL")
+
+
+def _achievement_progress(conn):
+    """ Running state of stateful achievement rules (streaks), one row per user and counter """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS achievement_progress (
+        user_id INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        value INTEGER NOT NULL,
+        marker TEXT,
+        PRIMARY KEY (user_id, key),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) WITHOUT ROWID""")
+
+
+def _quiz_answers(conn):
+    """ Per-question outcome of every quiz recorded through User.finish_quiz """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS quiz_answers (
+        result_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        question_id INTEGER,
+        outcome TEXT NOT NULL,
+        PRIMARY KEY (result_id, position),
+        FOREIGN KEY (result_id) REFERENCES results (id) ON DELETE CASCADE
+    ) WITHOUT ROWID""")
+
+
+# Shared by migration 12 and database.refresh_user_aggregates()
+BUMP_RESULTS_REVISION = """
+    INSERT INTO results_revision (user_id, revision) VALUES ({user_id}, 1)
+    ON CONFLICT(user_id) DO UPDATE SET revision = revision + 1"""
+
+
+def _results_revision(conn):
+    """ Per-user revision counter, bumped by any change to the user's results """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS results_revision (
+        user_id INTEGER PRIMARY KEY,
+        revision INTEGER NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )""")
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_results_revision_insert AFTER INSERT ON results
+    BEGIN{BUMP_RESULTS_REVISION.format(user_id="NEW.user_id")};
+    END""")
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_results_revision_delete AFTER DELETE ON results
+    BEGIN{BUMP_RESULTS_REVISION.format(user_id="OLD.user_id")};
+    END""")
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_results_revision_update AFTER UPDATE OF user_id, type, points, date ON results
+    BEGIN{BUMP_RESULTS_REVISION.format(user_id="OLD.user_id")};{BUMP_RESULTS_REVISION.format(user_id="NEW.user_id")};
+    END""")
+
+
+MIGRATIONS = [
+    (1, "base schema", _base_schema),
+    (2, "add results.user_id", _results_user_id),
+    (3, "questions.uid/source and meta table", _question_uid_and_meta),
+    (4, "indexes for hot queries", _hot_query_indexes),
+    (5, "incrementally maintained leaderboard", _leaderboard),
+    (6, "per-user statistics aggregates", _user_stats),
+    (7, "question bank revision counter", _bank_revision),
+    (8, "normalized question options", _question_options),
+    (9, "stable ids for manual questions", _manual_question_uids),
+    (10, "achievement rule progress", _achievement_progress),
+    (11, "per-question quiz outcomes", _quiz_answers),
+    (12, "per-user results revision counter", _results_revision),
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """ Apply pending migrations in one transaction; returns the list of versions applied """
+    current = schema_version(conn)
+    pending = [m for m in MIGRATIONS if m[0] > current]
+    if not pending:
+        return []
+    if conn.in_transaction:
+        conn.commit()
+    # Table rebuilds follow SQLite's recipe: foreign keys off for the duration
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys=OFF")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        # Another process may have migrated while we waited for the write lock
+        current = schema_version(conn)
+        pending = [m for m in pending if m[0] > current]
+        for version, description, apply in pending:
+            apply(conn)
+        if pending:
+            conn.execute(f"PRAGMA user_version = {pending[-1][0]}")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute(f"PRAGMA foreign_keys={'ON' if foreign_keys else 'OFF'}")
+    return [m[0] for m in pending]
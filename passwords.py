@@ -0,0 +1,197 @@
+"""
+Password hashing.
+
+Hashes are stored as self-describing strings, so the algorithm and its cost
+can change without a migration:
+
+    scrypt$<log2 n>$<r>$<p>$<salt hex>$<hash hex>
+    pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>
+    <64 hex digits>                  legacy unsalted SHA-256 (verify only)
+
+The hasher for new hashes is chosen with configure(), or load_settings()
+from the 'password_hasher' and 'password_cost' meta keys (which
+"python cli.py calibrate-passwords --save" writes); every stored hash that
+does not match it (legacy SHA-256, another algorithm or another cost) is
+reported by needs_rehash, and User.login replaces it after a successful
+login. The key derivation runs on a bounded thread pool: hashlib's scrypt and
+PBKDF2 release the GIL, so logins use every core and never run more KDFs at
+once than there are workers. calibrate() picks the cost for a target latency
+on this machine (see "python benchmark.py password_hashing").
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from database import get_meta, set_meta
+
+DEFAULT_ALGORITHM = 'scrypt'
+SCRYPT_LOG2_N = 14      # 16 MB of memory per hash with r=8
+PBKDF2_ITERATIONS = 600000
+SALT_BYTES = 16
+HASH_WORKERS = os.cpu_count() or 1
+
+
+class ScryptHasher:
+    algorithm = 'scrypt'
+
+    def __init__(self, cost=SCRYPT_LOG2_N, r=8, p=1):
+        self.cost = cost
+        self.r = r
+        self.p = p
+
+    def derive(self, password, salt, cost, r, p):
+        n = 2 ** cost
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p + 2 ** 20)
+
+    def hash(self, password):
+        salt = secrets.token_bytes(SALT_BYTES)
+        digest = self.derive(password, salt, self.cost, self.r, self.p)
+        return f"scrypt${self.cost}${self.r}${self.p}${salt.hex()}${digest.hex()}"
+
+    def verify(self, password, encoded):
+        _, cost, r, p, salt, digest = encoded.split('$')
+        return hmac.compare_digest(self.derive(password, bytes.fromhex(salt), int(cost), int(r), int(p)).hex(), digest)
+
+    def params(self, encoded):
+        return encoded.split('$')[1:4]
+
+    def current(self):
+        return [str(self.cost), str(self.r), str(self.p)]
+
+
+class Pbkdf2Hasher:
+    algorithm = 'pbkdf2_sha256'
+
+    def __init__(self, cost=PBKDF2_ITERATIONS):
+        self.cost = cost
+
+    def derive(self, password, salt, iterations):
+        return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+
+    def hash(self, password):
+        salt = secrets.token_bytes(SALT_BYTES)
+        return f"pbkdf2_sha256${self.cost}${salt.hex()}${self.derive(password, salt, self.cost).hex()}"
+
+    def verify(self, password, encoded):
+        _, iterations, salt, digest = encoded.split('$')
+        return hmac.compare_digest(self.derive(password, bytes.fromhex(salt), int(iterations)).hex(), digest)
+
+    def params(self, encoded):
+        return encoded.split('$')[1:2]
+
+    def current(self):
+        return [str(self.cost)]
+
+
+class LegacySha256Hasher:
+    """ The original unsalted SHA-256; only ever used to check old hashes """
+    algorithm = 'sha256'
+
+    def verify(self, password, encoded):
+        return hmac.compare_digest(hashlib.sha256(password.encode('utf-8')).hexdigest(), encoded)
+
+
+HASHERS = {'scrypt': ScryptHasher, 'pbkdf2_sha256': Pbkdf2Hasher}
+
+_hasher = HASHERS[DEFAULT_ALGORITHM]()
+_legacy = LegacySha256Hasher()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure(algorithm=DEFAULT_ALGORITHM, cost=None):
+    """ Choose the hasher for new hashes; cost is log2(n) for scrypt, iterations for PBKDF2 """
+    global _hasher
+    if algorithm not in HASHERS:
+        raise ValueError(f"unknown password hasher: {algorithm} (available: {', '.join(HASHERS)})")
+    _hasher = HASHERS[algorithm]() if cost is None else HASHERS[algorithm](cost)
+    return _hasher
+
+
+def load_settings(conn):
+    """ Configure the hasher stored in meta, if any; returns the hasher in use """
+    algorithm = get_meta(conn, 'password_hasher')
+    if algorithm is None:
+        return _hasher
+    cost = get_meta(conn, 'password_cost')
+    return configure(algorithm, int(cost) if cost is not None else None)
+
+
+def save_settings(conn, algorithm, cost):
+    """ Store and apply the hasher for new hashes """
+    hasher = configure(algorithm, cost)
+    with conn:
+        set_meta(conn, 'password_hasher', algorithm)
+        set_meta(conn, 'password_cost', str(cost))
+    return hasher
+
+
+def hasher_for(encoded):
+    """ The hasher that produced a stored hash """
+    algorithm = encoded.split('$', 1)[0] if '$' in encoded else 'sha256'
+    if algorithm == 'sha256':
+        return _legacy
+    if algorithm not in HASHERS:
+        raise ValueError(f"unknown password hash format: {algorithm}")
+    return HASHERS[algorithm]()
+
+
+def executor():
+    """ The shared pool key derivations run on, created on first use """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(HASH_WORKERS, thread_name_prefix='passwords')
+        return _pool
+
+
+def hash_password(password):
+    """ Hash a new password with the configured hasher (on the hashing pool) """
+    return executor().submit(_hasher.hash, password).result()
+
+
+def verify_password(password, encoded):
+    """ True if password matches the stored hash (on the hashing pool); malformed hashes never match """
+    try:
+        hasher = hasher_for(encoded)
+    except ValueError:
+        return False
+    try:
+        return executor().submit(hasher.verify, password, encoded).result()
+    except ValueError:
+        return False
+
+
+def needs_rehash(encoded):
+    """ True if a stored hash was not made by the configured hasher at its current cost """
+    hasher = hasher_for(encoded)
+    return hasher.algorithm != _hasher.algorithm or hasher.params(encoded) != _hasher.current()
+
+
+def calibrate(target_ms, algorithm=DEFAULT_ALGORITHM, repeat=3):
+    """ The highest cost whose hash takes at most target_ms on this machine (with the lowest cost as a floor) """
+    def latency_ms(cost):
+        hasher = HASHERS[algorithm](cost)
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            hasher.hash("calibration")
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    if algorithm == 'scrypt':
+        # Each step doubles the work
+        cost = 10
+        while cost < 20 and latency_ms(cost + 1) <= target_ms:
+            cost += 1
+        return cost
+    if algorithm == 'pbkdf2_sha256':
+        # Linear in the iterations: scale from a sample, rounded down to 10k
+        sample = 50000
+        return max(int(sample * target_ms / latency_ms(sample)) // 10000 * 10000, 10000)
+    raise ValueError(f"unknown password hasher: {algorithm} (available: {', '.join(HASHERS)})")
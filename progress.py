@@ -0,0 +1,127 @@
+"""
+Learning-progress series and charts.
+
+Results are aggregated in SQL into day, week or month buckets per quiz type
+(mean, best and number of quizzes per bucket), long histories are reduced to
+a fixed number of points with Largest-Triangle-Three-Buckets (LTTB), and the
+chart is rendered to PNG with matplotlib's Agg canvas - no pyplot, no GUI
+backend, so it can run on any thread. Rendered charts are cached by the
+user's results revision (a counter the results triggers bump on every insert,
+update or delete), so reopening an unchanged chart costs one primary-key lookup.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from database import get_connection
+
+MAX_POINTS = 120
+CACHE_SIZE = 32
+
+# Bucket start date for each results.date
+BUCKETS = {
+    'day': "date(date)",
+    'week': "date(date, '-6 days', 'weekday 1')",
+    'month': "date(date, 'start of month')",
+}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def progress_buckets(user_id, bucket='day', quiz_type=None, conn=None):
+    """ {type: [(bucket start 'YYYY-MM-DD', mean, best, count), ...]} for a user, oldest first """
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    sql = (f"SELECT type, {BUCKETS[bucket]} AS bucket, AVG(points), MAX(points), COUNT(*) FROM results "
+           "WHERE user_id = ?")
+    params = [user_id]
+    if quiz_type is not None:
+        sql += " AND type = ?"
+        params.append(quiz_type)
+    series = {}
+    for qtype, start, mean, best, count in (conn or get_connection()).execute(sql + " GROUP BY type, bucket ORDER BY type, bucket", params):
+        series.setdefault(qtype, []).append((start, mean, best, count))
+    return series
+
+
+def lttb(xs, ys, threshold):
+    """ Indices of the points LTTB keeps to draw xs/ys with at most threshold points """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    keep = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        lo, hi = int((i + 1) * every) + 1, min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[lo:hi]) / (hi - lo)
+        avg_y = sum(ys[lo:hi]) / (hi - lo)
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    keep.append(n - 1)
+    return keep
+
+
+def downsample(points, max_points=MAX_POINTS):
+    """ Reduce (bucket, mean, best, count) rows to at most max_points, keeping the shape of the mean """
+    if len(points) <= max_points:
+        return points
+    xs = [date.fromisoformat(p[0]).toordinal() for p in points]
+    ys = [p[1] for p in points]
+    return [points[i] for i in lttb(xs, ys, max_points)]
+
+
+def data_revision(user_id, conn=None):
+    """ The user's results revision, bumped by the results triggers on every change (0 before any result) """
+    row = (conn or get_connection()).execute(
+        "SELECT revision FROM results_revision WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] if row else 0
+
+
+def render_chart(series, bucket, title="Learning Progress", size=(9, 4.5), dpi=100):
+    """ PNG bytes of a mean/best line per quiz type """
+    import io
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=size, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    for qtype, points in sorted(series.items()):
+        days = [date.fromisoformat(p[0]) for p in points]
+        line, = ax.plot(days, [p[1] for p in points], marker='o', markersize=3, label=f"{qtype} (mean)")
+        ax.plot(days, [p[2] for p in points], linestyle=':', color=line.get_color(), label=f"{qtype} (best)")
+    ax.set_title(title)
+    ax.set_xlabel(bucket.capitalize())
+    ax.set_ylabel("Points")
+    if series:
+        ax.legend(loc='upper left', fontsize='small')
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+def progress_chart(user, bucket='day', quiz_type=None, max_points=MAX_POINTS, conn=None):
+    """ PNG bytes of a User's progress chart, served from the cache while their results are unchanged """
+    conn = conn or get_connection()
+    key = (user.id, bucket, quiz_type, max_points, data_revision(user.id, conn))
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    series = {t: downsample(points, max_points) for t, points in progress_buckets(user.id, bucket, quiz_type, conn).items()}
+    png = render_chart(series, bucket, title=f"Learning Progress - {user.username}")
+    with _cache_lock:
+        _cache[key] = png
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return png
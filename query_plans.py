@@ -0,0 +1,248 @@
+"""
+Query-plan regression check.
+
+Resolves the SQL of every execute()/executemany() call in the application
+modules (literals, module constants - also imported ones - and f-strings
+built from them), runs EXPLAIN QUERY PLAN for it against a freshly migrated
+database and fails (exit status 1) if any query reads a whole table - by a
+plain scan, or by an index scan without a LIMIT - unless ALLOWED_SCANS
+lists it. SQL that can only be assembled at run time must be registered in
+DYNAMIC_SQL with representative statements, so a call is never skipped
+silently. Run it after touching queries or migrations:
+
+    python query_plans.py
+
+test_query_plans.py runs the same check under pytest.
+"""
+import ast
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+import database
+
+MODULES = ['user.py', 'main.py', 'question_bank.py', 'question_io.py', 'achievements.py',
+           'progress.py', 'results_io.py', 'batch_grading.py', 'server.py', 'database.py', 'passwords.py']
+
+# Queries that read a whole table on purpose, with the reason
+ALLOWED_SCANS = {
+    "SELECT q.id, q.question, q.type, q.correct_answer, o.text, o.is_correct FROM questions q LEFT JOIN question_options o ON o.question_id = q.id ORDER BY q.id, o.ordinal":
+        "question cache loads the whole bank once per revision",
+    "SELECT q.uid, q.question, q.type, q.correct_answer, o.text, o.is_correct FROM questions q LEFT JOIN question_options o ON o.question_id = q.id ORDER BY q.id, o.ordinal":
+        "export-questions streams the whole bank",
+    "SELECT type, COUNT(*) FROM questions GROUP BY type":
+        "startup check counts the whole bank",
+    "SELECT username, id FROM users":
+        "results import maps every username to its id once",
+    "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'results'":
+        "schema lookup",
+    "SELECT id, uid FROM questions WHERE source='seed'":
+        "seeding runs only when questions.json changed",
+    "SELECT COUNT(*) FROM questions":
+        "startup check counts the whole bank",
+    "DELETE FROM leaderboard":
+        "rebuild-leaderboard recomputes it from scratch",
+    "INSERT INTO leaderboard (user_id, total_points, quizzes) SELECT user_id, SUM(points), COUNT(*) FROM results GROUP BY user_id":
+        "rebuild-leaderboard recomputes it from scratch",
+    "SELECT COUNT(*) FROM leaderboard":
+        "rebuild-leaderboard reports the rebuilt size",
+    "DELETE FROM user_stats":
+        "check-stats --rebuild recomputes the aggregates from scratch",
+    "DELETE FROM user_type_stats":
+        "check-stats --rebuild recomputes the aggregates from scratch",
+    "INSERT INTO user_stats (user_id, quizzes, total_points, best, last_played) SELECT user_id, COUNT(*), SUM(points), MAX(points), MAX(date) FROM results GROUP BY user_id":
+        "check-stats --rebuild recomputes the aggregates from scratch",
+    "INSERT INTO user_type_stats (user_id, type, quizzes, total_points, best) SELECT user_id, type, COUNT(*), SUM(points), MAX(points) FROM results GROUP BY user_id, type":
+        "check-stats --rebuild recomputes the aggregates from scratch",
+}
+
+# execute() calls whose SQL is assembled at run time, by (module, function):
+# representative expansions, whose plans are checked in their place
+DYNAMIC_SQL = {
+    ('progress.py', 'progress_buckets'): [
+        "SELECT type, date(date, '-6 days', 'weekday 1') AS bucket, AVG(points), MAX(points), COUNT(*) FROM results "
+        "WHERE user_id = ? AND type = ? GROUP BY type, bucket ORDER BY type, bucket",
+    ],
+    ('results_io.py', 'count_results'): [
+        "SELECT COUNT(*) FROM results r WHERE r.user_id = ? AND r.type = ? "
+        "AND r.date >= ? AND r.date <= ?",
+    ],
+    ('results_io.py', 'iter_results'): [
+        "SELECT r.id, u.username, r.type, r.points, r.date FROM results r LEFT JOIN users u ON u.id = r.user_id "
+        "WHERE r.user_id = ? ORDER BY r.id",
+    ],
+    # PRAGMA cache_size and dropping/re-creating the results triggers; no table reads
+    ('results_io.py', 'import_results'): [],
+    # The PRAGMAS applied to every new connection
+    ('database.py', 'get_connection'): [],
+    # CREATE TABLE statements
+    ('database.py', 'create_table'): [],
+    # check-stats compares whole aggregate tables with the results on purpose
+    ('database.py', 'check_user_stats'): [],
+}
+
+
+def _is_placeholders(node):
+    """ True for "','.join('?' * n)", the placeholder list of an IN (...) clause """
+    return (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'join'
+            and isinstance(node.func.value, ast.Constant) and len(node.args) == 1
+            and isinstance(node.args[0], ast.BinOp) and isinstance(node.args[0].op, ast.Mult)
+            and isinstance(node.args[0].left, ast.Constant) and node.args[0].left.value == '?')
+
+
+def _literal_sql(node, constants):
+    """ Evaluate node to a SQL string, or None if it is not built from constants.
+
+    Understands string literals, names bound to constants, '+' between them,
+    f-strings whose fields are constants, constant.format(key=constant) and
+    the "','.join('?' * n)" placeholder list (read as a single '?').
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Name):
+        return constants.get(node.id)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, right = _literal_sql(node.left, constants), _literal_sql(node.right, constants)
+        if left is not None and right is not None:
+            return left + right
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.FormattedValue):
+                if value.conversion != -1 or value.format_spec is not None:
+                    return None
+                part = '?' if _is_placeholders(value.value) else _literal_sql(value.value, constants)
+            else:
+                part = _literal_sql(value, constants)
+            if part is None:
+                return None
+            parts.append(part)
+        return ''.join(parts)
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'format'
+            and not node.args):
+        template = _literal_sql(node.func.value, constants)
+        fields = {kw.arg: _literal_sql(kw.value, constants) for kw in node.keywords}
+        if template is not None and None not in fields.values():
+            return template.format(**fields)
+    return None
+
+
+def module_constants(path, _seen=None):
+    """ {name: SQL string} for the module-level string constants of path, including those imported from sibling modules """
+    seen = _seen if _seen is not None else {}
+    if path in seen:
+        return seen[path]
+    constants = seen[path] = {}
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            sibling = os.path.join(os.path.dirname(path), node.module.replace('.', os.sep) + '.py')
+            if os.path.exists(sibling):
+                imported = module_constants(sibling, seen)
+                for alias in node.names:
+                    if alias.name in imported:
+                        constants[alias.asname or alias.name] = imported[alias.name]
+        elif isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            value = _literal_sql(node.value, constants)
+            if value is not None:
+                constants[node.targets[0].id] = value
+    return constants
+
+
+def _calls(tree):
+    """ Yield (function name, execute()/executemany() call) for every such call in tree """
+    def visit(node, function):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                yield from visit(child, child.name)
+                continue
+            if (isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute)
+                    and child.func.attr in ('execute', 'executemany') and child.args):
+                yield function, child
+            yield from visit(child, function)
+    yield from visit(tree, '<module>')
+
+
+def collect_queries(paths):
+    """ Yield (path, line, function, sql) for every execute()/executemany() call; sql is None when it cannot be resolved """
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), path)
+        constants = module_constants(path)
+        for function, node in _calls(tree):
+            sql = _literal_sql(node.args[0], constants)
+            yield path, node.lineno, function, (' '.join(sql.split()) if sql is not None else None)
+
+
+def full_scans(conn, sql):
+    """ Return the tables (or aliases) that the plan of sql reads from end to end.
+
+    A scan along an index still visits every row unless a LIMIT stops it
+    early, so it only passes when the query has one.
+    """
+    numbered = [int(n) for n in re.findall(r'\?(\d+)', sql)]
+    params = (None,) * (max(numbered) if numbered else sql.count('?'))
+    plan = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+    # Scans of materialized subqueries are reads of a temp result, not of a table
+    derived = {detail.split()[-1] for detail in plan if detail.startswith(('MATERIALIZE ', 'CO-ROUTINE '))}
+    limited = re.search(r'\bLIMIT\b', sql, re.IGNORECASE) is not None
+    scans = []
+    for detail in plan:
+        if detail.startswith('SCAN ') and detail != 'SCAN CONSTANT ROW' and not ('USING' in detail and limited):
+            name = detail.split()[1]
+            if name not in derived:
+                scans.append(name)
+    return scans
+
+
+def check(paths=MODULES):
+    """ Print a report and return the list of failures (full scans and unresolved SQL); empty when all is well """
+    database.close_connection()
+    database.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="quiz_plans_"), "plans.db")
+    conn = database.create_database()
+    failures = []
+    for path, line, function, sql in collect_queries(paths):
+        if sql is None:
+            samples = DYNAMIC_SQL.get((os.path.basename(path), function))
+            if samples is None:
+                failures.append(f"{path}:{line}  SQL in {function}() cannot be resolved; "
+                                "build it from module constants or add it to DYNAMIC_SQL")
+                print(f"FAIL     {failures[-1]}")
+                continue
+            print(f"dynamic  {path}:{line}  in {function}(), checking {len(samples)} representative statement(s)")
+            for sample in samples:
+                failures.extend(_check_query(conn, path, line, sample))
+            continue
+        failures.extend(_check_query(conn, path, line, sql))
+    database.close_connection()
+    shutil.rmtree(os.path.dirname(database.DB_FILE), ignore_errors=True)
+    return failures
+
+
+def _check_query(conn, path, line, sql):
+    """ Report one statement; returns [failure] if it scans a table it should not, else [] """
+    if not sql.upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'INSERT')):
+        return []
+    scans = full_scans(conn, sql)
+    if not scans:
+        return []
+    if sql in ALLOWED_SCANS:
+        print(f"allowed  {path}:{line}  scans {', '.join(scans)} ({ALLOWED_SCANS[sql]})")
+        return []
+    failure = f"{path}:{line}  scans {', '.join(scans)}\n         {sql}"
+    print(f"FAIL     {failure}")
+    return [failure]
+
+
+def module_paths(modules=MODULES):
+    here = os.path.dirname(os.path.abspath(__file__))
+    return [os.path.join(here, m) for m in modules]
+
+
+if __name__ == "__main__":
+    failures = len(check(module_paths()))
+    print(f"{failures} quer{'y' if failures == 1 else 'ies'} with full table scans or unresolved SQL")
+    sys.exit(1 if failures else 0)
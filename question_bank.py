@@ -0,0 +1,171 @@
+"""
+Process-level cache of the question bank.
+
+The whole bank is loaded once and indexed by question type. Every change to
+the questions table bumps the 'bank_revision' counter in meta (see
+migration 7), so checking freshness costs one primary-key lookup; the cache
+reloads only when the revision moved.
+"""
+import random
+import threading
+
+from database import get_connection, get_meta
+
+
+# One indexed join; options arrive pre-split and in ordinal order
+QUESTIONS_WITH_OPTIONS = """
+    SELECT q.id, q.question, q.type, q.correct_answer, o.text, o.is_correct
+    FROM questions q LEFT JOIN question_options o ON o.question_id = q.id"""
+
+
+def iter_questions(rows):
+    """ Group (id, question, type, correct_answer, option, is_correct) rows, ordered by id, into question dicts.
+
+    Yields each question as soon as its last row has been read, so a cursor
+    can be streamed without materializing the bank.
+    """
+    q = None
+    for qid, text, qtype, correct, option, is_correct in rows:
+        if q is None or q['id'] != qid:
+            if q is not None:
+                yield q
+            q = {'id': qid, 'question': text, 'type': qtype, 'options': [],
+                 'answer': [] if qtype == 'multiple' else (correct if qtype != 'single' else None)}
+        if option is None:
+            continue
+        q['options'].append(option)
+        if is_correct:
+            if qtype == 'multiple':
+                q['answer'].append(option)
+            else:
+                q['answer'] = option
+    if q is not None:
+        yield q
+
+
+def rows_to_questions(rows):
+    """ List of question dicts from rows ordered by id (see iter_questions) """
+    return list(iter_questions(rows))
+
+
+def fetch_questions(conn, ids):
+    """ Load the questions with the given ids, in the order given """
+    if not ids:
+        return []
+    rows = conn.execute(QUESTIONS_WITH_OPTIONS + f" WHERE q.id IN ({','.join('?' * len(ids))}) ORDER BY q.id, o.ordinal", list(ids))
+    by_id = {q['id']: q for q in rows_to_questions(rows)}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def sample_question_ids(conn, question_type, n):
+    """ Draw up to n distinct random question ids of a type straight from SQLite.
+
+    Random probes into the (type, id) index cost O(log bank) each, so the
+    total cost scales with n rather than with the bank size. Ids that follow
+    a gap in the id sequence are slightly more likely to be drawn.
+    """
+    # Two single-aggregate queries: SQLite only answers a lone MIN()/MAX() from the index ends
+    lo = conn.execute("SELECT MIN(id) FROM questions WHERE type=?", (question_type,)).fetchone()[0]
+    hi = conn.execute("SELECT MAX(id) FROM questions WHERE type=?", (question_type,)).fetchone()[0]
+    if lo is None:
+        return []
+    ids = set()
+    for _ in range(n * 4):
+        if len(ids) >= n:
+            break
+        row = conn.execute("SELECT id FROM questions WHERE type=? AND id>=? ORDER BY id LIMIT 1",
+                           (question_type, random.randint(lo, hi))).fetchone()
+        ids.add(row[0])
+    if len(ids) < n:
+        # Small bank or unlucky probes: fall back to an exact draw over the index
+        all_ids = [row[0] for row in conn.execute("SELECT id FROM questions WHERE type=?", (question_type,))]
+        return random.sample(all_ids, min(n, len(all_ids)))
+    ids = list(ids)
+    random.shuffle(ids)
+    return ids
+
+
+class QuestionCache:
+    def __init__(self):
+        self.by_type = {}
+        self.strata = {}
+        self.revision = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _current_revision(self, conn):
+        return get_meta(conn, 'bank_revision')
+
+    def _load(self, conn, revision):
+        by_type = {}
+        for q in rows_to_questions(conn.execute(QUESTIONS_WITH_OPTIONS + " ORDER BY q.id, o.ordinal")):
+            by_type.setdefault(q['type'], []).append(q)
+        self.by_type = by_type
+        self.strata = {}
+        self.revision = revision
+
+    def get(self, question_type):
+        """ Return the cached list of questions of a type (do not mutate it) """
+        conn = get_connection()
+        revision = self._current_revision(conn)
+        with self._lock:
+            if revision == self.revision:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._load(conn, revision)
+            return self.by_type.get(question_type, [])
+
+    def invalidate(self):
+        with self._lock:
+            self.revision = None
+
+    def _for_session(self, q):
+        """ Single-choice questions get their own shuffled option list; others are shared read-only """
+        if q['type'] == 'single':
+            return dict(q, options=random.sample(q['options'], len(q['options'])))
+        return q
+
+    def quiz_questions(self, question_type):
+        """ Every question of a type, prepared for one quiz session """
+        return [self._for_session(q) for q in self.get(question_type)]
+
+    def _groups(self, question_type, key):
+        """ Questions of a type grouped by q[key], built once per bank revision """
+        groups = self.strata.get((question_type, key))
+        if groups is None:
+            groups = {}
+            for q in self.by_type.get(question_type, []):
+                groups.setdefault(q.get(key), []).append(q)
+            self.strata[(question_type, key)] = groups
+        return groups
+
+    def sample(self, question_type, n, stratify_by=None):
+        """ n distinct random questions of a type, prepared for one quiz session.
+
+        With stratify_by (a question field such as 'topic' or 'difficulty') the
+        draw is split across the field's values in proportion to their size.
+        Cost is O(n) plus the number of strata; the bank is never copied.
+        """
+        pool = self.get(question_type)
+        n = min(n, len(pool))
+        if not stratify_by:
+            picked = random.sample(pool, n)
+        else:
+            with self._lock:
+                groups = list(self._groups(question_type, stratify_by).values())
+            quotas = [n * len(g) // len(pool) for g in groups]
+            # Hand the rounding remainder to the largest strata
+            for i in sorted(range(len(groups)), key=lambda i: -len(groups[i]))[:n - sum(quotas)]:
+                quotas[i] += 1
+            picked = [q for g, k in zip(groups, quotas) for q in random.sample(g, min(k, len(g)))]
+            random.shuffle(picked)
+        return [self._for_session(q) for q in picked]
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'revision': self.revision,
+                'questions': sum(len(qs) for qs in self.by_type.values())}
+
+
+question_cache = QuestionCache()
@@ -0,0 +1,223 @@
+"""
+Question-bank import and export as JSONL.
+
+One question per line, the same shape as the entries of questions.json:
+
+    {"id": "net-0001", "type": "single", "question": "Which layer routes packets?",
+     "answer": "Network", "options": ["Physical", "Network", "Session", "Transport"]}
+
+    id        stable, unique question id (stored as questions.uid); re-importing
+              a line with a known id updates that question instead of adding one
+    type      "single", "multiple" or "open"
+    question  the question text
+    answer    the correct option (single), a list of correct options (multiple)
+              or the reference answer (open)
+    options   every choice shown, in display order (single/multiple only)
+
+Import parses and validates chunks of lines on a process pool, compares each
+batch with what is stored and upserts only new or changed questions, all in
+one transaction; with dry_run nothing is written and the diff is reported.
+Export streams the bank from a cursor, so neither side holds the whole bank
+in memory.
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from database import get_connection, upsert_questions
+from question_bank import iter_questions
+
+QUESTION_TYPES = ('single', 'multiple', 'open')
+CHUNK_SIZE = 2000
+# One '?' per question id in the IN (...) lookup: SQLite before 3.32 allows at most 999
+BATCH_SIZE = 900
+
+# Stream the bank keyed on each question's stable id
+EXPORT_QUERY = """
+    SELECT q.uid, q.question, q.type, q.correct_answer, o.text, o.is_correct
+    FROM questions q LEFT JOIN question_options o ON o.question_id = q.id"""
+
+
+def _is_text(value):
+    return isinstance(value, str) and value.strip() != ''
+
+
+def validate(record):
+    """ Return an error message for an invalid question record, or None """
+    if not isinstance(record, dict):
+        return "not a JSON object"
+    for field in ('id', 'type', 'question', 'answer'):
+        if field not in record:
+            return f"missing field '{field}'"
+    if not _is_text(record['id']):
+        return "id must be a non-empty string"
+    if record['type'] not in QUESTION_TYPES:
+        return "type must be single, multiple or open"
+    if not _is_text(record['question']):
+        return "question must be a non-empty string"
+    answer, options = record['answer'], record.get('options') or []
+    if record['type'] == 'open':
+        if not _is_text(answer):
+            return "answer of an open question must be a non-empty string"
+        if options:
+            return "open questions take no options"
+        return None
+    if not isinstance(options, list) or len(options) < 2 or not all(_is_text(o) for o in options):
+        return "options must be a list of at least two non-empty strings"
+    if len(set(options)) != len(options):
+        return "options must be distinct"
+    if record['type'] == 'single':
+        if not _is_text(answer) or answer not in options:
+            return "answer must be one of the options"
+    elif (not isinstance(answer, list) or not answer or not all(_is_text(a) for a in answer)
+          or not set(answer) <= set(options) or len(set(answer)) != len(answer)):
+        return "answer must be a non-empty list of distinct options"
+    return None
+
+
+def normalize(record):
+    """ The stored form of a valid record: known fields only, options in display order """
+    q = {'id': record['id'], 'type': record['type'], 'question': record['question'], 'answer': record['answer']}
+    if record['type'] != 'open':
+        q['options'] = list(record['options'])
+        if record['type'] == 'multiple':
+            # Stored answers come back in option order
+            q['answer'] = [o for o in q['options'] if o in set(record['answer'])]
+    return q
+
+
+def parse_lines(numbered_lines):
+    """ Worker: parse and validate (line number, text) pairs; returns (line number, question, error) triples """
+    parsed = []
+    for lineno, line in numbered_lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            parsed.append((lineno, None, f"invalid JSON: {e}"))
+            continue
+        try:
+            error = validate(record)
+            question = None if error else normalize(record)
+        except Exception as e:
+            # Whatever slips past validate() invalidates this line only, not the import
+            question, error = None, f"invalid question: {e}"
+        parsed.append((lineno, question, error))
+    return parsed
+
+
+def _chunks(lines, size):
+    chunk = []
+    for lineno, line in enumerate(lines, 1):
+        chunk.append((lineno, line))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_bank(lines, workers=None, chunk_size=CHUNK_SIZE):
+    """ Yield (line number, question or None, error or None) for JSONL lines, in input order.
+
+    The first chunk is parsed in-process; a process pool is only started when
+    there is more than one, with at most a few chunks in flight.
+    """
+    chunks = _chunks(lines, chunk_size)
+    first = next(chunks, None)
+    if first is None:
+        return
+    second = next(chunks, None)
+    if second is None:
+        yield from parse_lines(first)
+        return
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        pending = [pool.submit(parse_lines, first), pool.submit(parse_lines, second)]
+        for chunk in chunks:
+            pending.append(pool.submit(parse_lines, chunk))
+            while len(pending) > workers * 2:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
+
+
+def stored_questions(conn, uids):
+    """ {uid: question} for the stored questions among uids, in the normalized import form """
+    if not uids:
+        return {}
+    rows = conn.execute(EXPORT_QUERY + f" WHERE q.uid IN ({','.join('?' * len(uids))}) ORDER BY q.id, o.ordinal", list(uids))
+    return {q['id']: _exported(q) for q in iter_questions(rows)}
+
+
+def _exported(q):
+    """ Question dict from iter_questions in the JSONL form """
+    record = {'id': q['id'], 'type': q['type'], 'question': q['question'], 'answer': q['answer']}
+    if q['type'] != 'open':
+        record['options'] = q['options']
+    return record
+
+
+def import_bank(lines, conn=None, dry_run=False, on_diff=None, workers=None, batch_size=BATCH_SIZE):
+    """ Import JSONL question lines; returns counts of added, changed, unchanged and invalid lines.
+
+    on_diff(status, line number, id or message) is called for every 'added',
+    'changed' and 'invalid' line, which makes a dry run a readable diff. A
+    later line with an id already seen in the same input is invalid.
+    """
+    conn = conn or get_connection()
+    stats = {'added': 0, 'changed': 0, 'unchanged': 0, 'invalid': 0}
+    start = time.perf_counter()
+    seen = set()
+    batch = []
+
+    def report(status, lineno, detail):
+        stats[status] += 1
+        if on_diff:
+            on_diff(status, lineno, detail)
+
+    def flush():
+        stored = stored_questions(conn, [q['id'] for _, q in batch])
+        changed = []
+        for lineno, q in batch:
+            old = stored.get(q['id'])
+            if old == q:
+                stats['unchanged'] += 1
+                continue
+            report('added' if old is None else 'changed', lineno, q['id'])
+            changed.append(q)
+        if changed and not dry_run:
+            upsert_questions(conn, changed, source='import')
+        batch.clear()
+
+    with conn:
+        for lineno, q, error in read_bank(lines, workers):
+            if error is None and q['id'] in seen:
+                error = f"duplicate id {q['id']}"
+            if error is not None:
+                report('invalid', lineno, error)
+                continue
+            seen.add(q['id'])
+            batch.append((lineno, q))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def export_bank(out, conn=None, quiz_type=None):
+    """ Write the bank (or one type of it) to a text stream as JSONL; returns the number of questions """
+    conn = conn or get_connection()
+    if quiz_type is None:
+        rows = conn.execute(EXPORT_QUERY + " ORDER BY q.id, o.ordinal")
+    else:
+        rows = conn.execute(EXPORT_QUERY + " WHERE q.type = ? ORDER BY q.id, o.ordinal", (quiz_type,))
+    count = 0
+    for q in iter_questions(rows):
+        out.write(json.dumps(_exported(q), ensure_ascii=False) + '\n')
+        count += 1
+    return count
@@ -1,11 +1,17 @@
 import random
+from grading import grade
+
+# Per-question outcomes stored in quiz_answers
+OUTCOMES = ('correct', 'incorrect', 'skipped', 'timeout', 'unanswered')
 
 class Quiz:
-    def __init__(self, questions, user=None):
+    def __init__(self, questions, user=None, quiz_type=None):
         self.questions = questions  # List of dicts: {'question', 'type', 'options', 'answer', 'hint'}
         self.current_question = 0
         self.points = 0
         self.user = user
+        self.quiz_type = quiz_type
+        self.outcomes = {}  # question index -> one of OUTCOMES
         self.lifelines = {
             'fifty_fifty': True,
             'hint': True,
@@ -17,20 +23,11 @@ class Quiz:
         self.current_question += 1
 
     def check_answer(self, user_answer):
-        q = self.questions[self.current_question]
-        correct = q['answer']
-        if q['type'] == 'single':
-            return user_answer == correct
-        elif q['type'] == 'multiple':
-            return set(user_answer) == set(correct)
-        elif q['type'] == 'open':
-            # Check if at least 2 key words from answer are present
-            user_answer = user_answer.lower()
-            correct_answer = correct.lower()
-            key_words = [word for word in correct_answer.split() if len(word) > 3][:5]
-            matches = sum(1 for word in key_words if word in user_answer)
-            return matches >= 2
-        return False
+        return self.grade_answer(user_answer).correct
+
+    def grade_answer(self, user_answer):
+        """Grade the current question; for open questions the Grade lists matched key terms"""
+        return grade(self.questions[self.current_question], user_answer)
 
     def use_fifty_fifty(self):
         q = self.questions[self.current_question]
@@ -49,7 +46,24 @@ class Quiz:
         return q.get('hint', 'No hint available for this question.')
 
     def use_skip(self):
+        self.record('skipped')
         self.current_question += 1
 
+    def record(self, outcome):
+        """ Set the outcome of the current question (answering it again replaces it); points follow the outcomes """
+        previous = self.outcomes.get(self.current_question)
+        self.outcomes[self.current_question] = outcome
+        self.points += (outcome == 'correct') - (previous == 'correct')
+
+    def finish(self):
+        """ Record this quiz for its user in one transaction (see User.finish_quiz) """
+        # The score is the number of correct outcomes, however often a question was answered
+        self.points = sum(1 for outcome in self.outcomes.values() if outcome == 'correct')
+        return self.user.finish_quiz(self.quiz_type, self.points, self.answer_rows(), len(self.questions))
+
+    def answer_rows(self):
+        """ (position, question id, outcome) for every question, for quiz_answers """
+        return [(i, q.get('id'), self.outcomes.get(i, 'unanswered')) for i, q in enumerate(self.questions)]
+
     def get_progress(self):
         return self.current_question, len(self.questions) 
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""
+Streaming export and bulk import of quiz results.
+
+Results are read from a cursor in chunks of CHUNK_SIZE rows and written as
+JSONL (one object per line) or CSV, gzip-compressed when the file name ends
+in ".gz", so memory stays flat however large the results table is:
+
+    {"id": 1, "username": "alice", "type": "open", "points": 12, "date": "2025-06-01 10:00:00"}
+
+The format follows the file name (.jsonl / .csv, optionally + .gz).
+
+import_results reads the same formats back incrementally. Rows are matched
+to users by username (ids in the file are ignored) and deduplicated on the
+natural key (username, type, points, date), so importing a file twice, or
+a file that overlaps the database, adds nothing the second time. The
+per-row aggregate triggers on results are suspended for the import and the
+leaderboard/statistics of the affected users are re-derived once at the end,
+all inside the same transaction.
+"""
+import csv
+import gzip
+import json
+import time
+
+from database import get_connection, refresh_user_aggregates
+
+CHUNK_SIZE = 5000
+IMPORT_BATCH_SIZE = 50000
+IMPORT_CACHE_KB = 65536
+QUIZ_TYPES = ('single', 'multiple', 'open')
+FIELDS = ('id', 'username', 'type', 'points', 'date')
+FORMATS = ('jsonl', 'csv')
+
+
+def format_for(path):
+    """ 'jsonl' or 'csv' from a file name such as results.csv.gz """
+    name = path.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return 'csv' if name.endswith('.csv') else 'jsonl'
+
+
+def open_input(path):
+    """ Open path for reading text, through gzip when it ends in .gz """
+    if path.lower().endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def open_output(path):
+    """ Open path for writing text, through gzip when it ends in .gz """
+    if path.lower().endswith('.gz'):
+        return gzip.open(path, 'wt', compresslevel=6, encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def _where(user_id=None, since=None, until=None, quiz_type=None):
+    """ WHERE clause and parameters for the export filters; dates are inclusive 'YYYY-MM-DD[ HH:MM:SS]' bounds """
+    clauses, params = [], []
+    if user_id is not None:
+        clauses.append("r.user_id = ?")
+        params.append(user_id)
+    if quiz_type is not None:
+        clauses.append("r.type = ?")
+        params.append(quiz_type)
+    if since is not None:
+        clauses.append("r.date >= ?")
+        params.append(since)
+    if until is not None:
+        # A bare date includes the whole day
+        clauses.append("r.date <= ?")
+        params.append(until if len(until) > 10 else until + ' 23:59:59')
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def count_results(conn=None, **filters):
+    """ Number of results an export with these filters would write """
+    where, params = _where(**filters)
+    return (conn or get_connection()).execute("SELECT COUNT(*) FROM results r" + where, params).fetchone()[0]
+
+
+def iter_results(conn=None, chunk_size=CHUNK_SIZE, **filters):
+    """ Yield lists of up to chunk_size (id, username, type, points, date) rows, oldest first """
+    where, params = _where(**filters)
+    cursor = (conn or get_connection()).execute(
+        "SELECT r.id, u.username, r.type, r.points, r.date FROM results r LEFT JOIN users u ON u.id = r.user_id"
+        + where + " ORDER BY r.id", params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+
+def write_results(out, fmt, chunks, progress=None):
+    """ Write chunks of result rows to a text stream; returns the row count """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format: {fmt}")
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(FIELDS)
+    for rows in chunks:
+        if fmt == 'csv':
+            writer.writerows(rows)
+        else:
+            out.write(''.join(json.dumps(dict(zip(FIELDS, row))) + '\n' for row in rows))
+        count += len(rows)
+        if progress:
+            progress(count)
+    return count
+
+
+def export_results(path, conn=None, fmt=None, progress=None, chunk_size=CHUNK_SIZE, **filters):
+    """ Stream the matching results to path and return how many were written.
+
+    filters: user_id, since, until, quiz_type. progress(count) is called
+    after every chunk; it runs on the exporting thread.
+    """
+    with open_output(path) as out:
+        return write_results(out, fmt or format_for(path), iter_results(conn, chunk_size, **filters), progress)
+
+
+LEGACY_ARRAY = ("this is a results.json array from an older version; it has no usernames, so its results "
+                "cannot be matched to users - export the results again as JSONL or CSV")
+
+
+def read_results(src, fmt):
+    """ Yield result dicts ({'username', 'type', 'points', 'date'}) from a JSONL or CSV stream, one line at a time.
+
+    A JSONL line that does not parse is yielded as None, for the caller to
+    count as invalid. The indented JSON array the old results.json export
+    wrote is rejected with ValueError(LEGACY_ARRAY).
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(src)
+    elif fmt == 'jsonl':
+        first = True
+        for line in src:
+            line = line.strip()
+            if not line:
+                continue
+            if first and line.startswith('['):
+                raise ValueError(LEGACY_ARRAY)
+            first = False
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+    else:
+        raise ValueError(f"unknown import format: {fmt}")
+
+
+def _batches(records, user_ids, stats, batch_size):
+    """ Validate records and yield lists of (user_id, type, points, date) tuples """
+    batch = []
+    for record in records:
+        stats['read'] += 1
+        try:
+            user_id = user_ids.get(record.get('username'))
+            quiz_type, points, date = record['type'], int(record['points']), str(record['date'])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            stats['invalid'] += 1
+            continue
+        if quiz_type not in QUIZ_TYPES or len(date) < 10:
+            stats['invalid'] += 1
+        elif user_id is None:
+            stats['unknown_users'] += 1
+        else:
+            batch.append((user_id, quiz_type, points, date))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+# Insert unless the natural key already exists; the lookup is an
+# idx_results_user_points probe and also sees rows inserted earlier in the
+# same import, so duplicates inside the file are dropped too
+INSERT_NEW_RESULT = ("INSERT INTO results (user_id, type, points, date) SELECT ?1, ?2, ?3, ?4 "
+                     "WHERE NOT EXISTS (SELECT 1 FROM results WHERE user_id = ?1 AND points = ?3 AND type = ?2 AND date = ?4)")
+
+
+def _natural_key(row):
+    # idx_results_user_points column order, so each batch walks the index
+    return row[0], row[2], row[1], row[3]
+
+
+def import_results(path, conn=None, fmt=None, progress=None, batch_size=IMPORT_BATCH_SIZE):
+    """ Import results from a JSONL/CSV(.gz) file in one transaction.
+
+    Returns a dict with read, inserted, duplicates, unknown_users, invalid
+    and seconds. progress(read) is called after every batch. On any error
+    nothing is imported.
+    """
+    conn = conn or get_connection()
+    stats = {'read': 0, 'inserted': 0, 'duplicates': 0, 'unknown_users': 0, 'invalid': 0}
+    start = time.perf_counter()
+    user_ids = dict(conn.execute("SELECT username, id FROM users"))
+    touched = set()
+    cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+    conn.execute(f"PRAGMA cache_size = -{IMPORT_CACHE_KB}")
+    try:
+        with open_input(path) as src, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'results'").fetchall()
+            for name, _ in triggers:
+                conn.execute(f"DROP TRIGGER {name}")
+            for batch in _batches(read_results(src, fmt or format_for(path)), user_ids, stats, batch_size):
+                batch.sort(key=_natural_key)
+                # rowcount counts the rows actually inserted, duplicates excluded
+                inserted = conn.executemany(INSERT_NEW_RESULT, batch).rowcount
+                stats['inserted'] += inserted
+                stats['duplicates'] += len(batch) - inserted
+                if inserted:
+                    touched.update(row[0] for row in batch)
+                if progress:
+                    progress(stats['read'])
+            for _, sql in triggers:
+                conn.execute(sql)
+            refresh_user_aggregates(conn, touched)
+    finally:
+        conn.execute(f"PRAGMA cache_size = {cache_size}")
+    stats['seconds'] = time.perf_counter() - start
+    return stats
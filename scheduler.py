@@ -0,0 +1,85 @@
+"""
+One tick scheduler per Tk application.
+
+All countdowns (such as the per-question quiz timer) share a single after()
+chain: at most one callback is pending at any time, it fires at most once
+per TICK_MS however many countdowns exist or have been started and
+cancelled, and the chain stops when no countdown is active. Remaining time is
+computed from a monotonic clock, so a late tick never stretches a countdown.
+"""
+import math
+import time
+
+TICK_MS = 1000
+
+
+class Countdown:
+    """ Handle of a running countdown; pass it to TickScheduler.cancel """
+    __slots__ = ('deadline', 'on_tick', 'on_expire', 'active')
+
+    def __init__(self, deadline, on_tick, on_expire):
+        self.deadline = deadline
+        self.on_tick = on_tick
+        self.on_expire = on_expire
+        self.active = True
+
+
+class TickScheduler:
+    def __init__(self, root, clock=time.monotonic, tick_ms=TICK_MS):
+        self.root = root
+        self.clock = clock
+        self.tick_ms = tick_ms
+        self.countdowns = []
+        self.pending = None  # id of the one outstanding after() callback
+        self.wakeups = 0
+
+    def remaining(self, countdown):
+        """ Whole seconds left, rounded up """
+        return max(math.ceil(countdown.deadline - self.clock() - 1e-9), 0)
+
+    def start(self, seconds, on_tick, on_expire):
+        """ Start a countdown; on_tick(seconds left) runs now and on every tick, on_expire() once at zero """
+        countdown = Countdown(self.clock() + seconds, on_tick, on_expire)
+        self.countdowns.append(countdown)
+        on_tick(self.remaining(countdown))
+        if self.pending is None:
+            self.pending = self.root.after(self.tick_ms, self._tick)
+        return countdown
+
+    def cancel(self, countdown):
+        """ Stop a countdown (no-op if it already expired or was cancelled) """
+        if countdown is None or not countdown.active:
+            return
+        countdown.active = False
+        self.countdowns.remove(countdown)
+        if not self.countdowns and self.pending is not None:
+            self.root.after_cancel(self.pending)
+            self.pending = None
+
+    def cancel_all(self):
+        for countdown in list(self.countdowns):
+            self.cancel(countdown)
+
+    def _tick(self):
+        self.pending = None
+        self.wakeups += 1
+        for countdown in list(self.countdowns):
+            if not countdown.active:
+                continue  # cancelled by an earlier callback of this tick
+            left = self.remaining(countdown)
+            countdown.on_tick(left)
+            if left == 0 and countdown.active:
+                countdown.active = False
+                self.countdowns.remove(countdown)
+                countdown.on_expire()
+        if self.countdowns and self.pending is None:
+            self.pending = self.root.after(self.tick_ms, self._tick)
+
+
+def get_scheduler(widget):
+    """ The scheduler of widget's application, created on first use """
+    root = widget.winfo_toplevel()
+    scheduler = getattr(root, 'tick_scheduler', None)
+    if scheduler is None:
+        scheduler = root.tick_scheduler = TickScheduler(root)
+    return scheduler
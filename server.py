@@ -0,0 +1,308 @@
+"""
+Headless quiz session service: a small asyncio HTTP/JSON server so a whole
+class can take quizzes against one machine.
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8080] [--db knowledge_tests.db]
+
+Endpoints (JSON in, JSON out; every call but /login needs the header
+"Authorization: Bearer <token>" with the token returned by /login):
+
+    POST /login            {"username", "password"}        -> {"token", "username"}
+    POST /quiz/start       {"type", "length"?}             -> {"question"}
+    GET  /quiz/question                                    -> {"question"} or {"finished": true}
+    POST /quiz/answer      {"answer"}                      -> {"correct", "matched", "question"|"finished"}
+    POST /quiz/lifeline    {"lifeline": "fifty_fifty"|"hint"|"skip"}
+    POST /quiz/finish                                      -> {"points", "total", "stats", "achievements"}
+    POST /logout                                           -> {"logged_out": true}
+
+Sessions live in memory and end at /logout or after SESSION_TTL seconds
+without a request; all database work (login, loading questions, saving
+results) runs on a thread pool so the event loop never blocks; password
+checks run on the shared hashing pool (see passwords.py). Malformed requests
+get a 400 and unexpected errors a 500 (logged to log.txt); the connection
+is only closed when the request framing itself is broken.
+"""
+import argparse
+import asyncio
+import json
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import database
+import passwords
+from question_bank import question_cache
+from logger import log_error
+from quiz import Quiz
+from user import User
+
+QUIZ_LENGTH = 15
+DB_THREADS = 4
+MAX_BODY = 64 * 1024
+SESSION_TTL = 30 * 60
+SWEEP_SECONDS = 60
+
+REASONS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found', 409: 'Conflict', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def public_question(quiz):
+    """ The current question without its answer, or None when the quiz is over """
+    if quiz.current_question >= len(quiz.questions):
+        return None
+    q = quiz.questions[quiz.current_question]
+    return {'index': quiz.current_question, 'total': len(quiz.questions),
+            'question': q['question'], 'type': q['type'], 'options': q['options']}
+
+
+def valid_answer(question_type, answer):
+    """ True if answer has the shape a question type expects: a list of strings for multiple choice, else a string """
+    if question_type == 'multiple':
+        return isinstance(answer, list) and all(isinstance(a, str) for a in answer)
+    return isinstance(answer, str)
+
+
+class QuizService:
+    def __init__(self, db_threads=DB_THREADS, session_ttl=SESSION_TTL, clock=time.monotonic):
+        self.sessions = {}  # token -> {'user': User, 'quiz': Quiz or None, 'type': str, 'seen': clock time}
+        self.session_ttl = session_ttl
+        self.clock = clock
+        self.sweeper = None
+        self.executor = ThreadPoolExecutor(db_threads, thread_name_prefix='quiz-db')
+        self.routes = {
+            ('POST', '/login'): self.login,
+            ('POST', '/logout'): self.logout,
+            ('POST', '/quiz/start'): self.start_quiz,
+            ('GET', '/quiz/question'): self.question,
+            ('POST', '/quiz/answer'): self.answer,
+            ('POST', '/quiz/lifeline'): self.lifeline,
+            ('POST', '/quiz/finish'): self.finish,
+        }
+
+    async def run_db(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def token(self, headers):
+        return headers.get('authorization', '').removeprefix('Bearer ').strip()
+
+    def session(self, headers):
+        token = self.token(headers)
+        session = self.sessions.get(token)
+        now = self.clock()
+        if session is not None and now - session['seen'] > self.session_ttl:
+            del self.sessions[token]
+            session = None
+        if session is None:
+            raise HTTPError(401, "unknown or missing session token")
+        session['seen'] = now
+        return session
+
+    def expire_sessions(self):
+        """ Drop every session idle for longer than the TTL; returns how many were dropped """
+        cutoff = self.clock() - self.session_ttl
+        expired = [token for token, session in self.sessions.items() if session['seen'] < cutoff]
+        for token in expired:
+            del self.sessions[token]
+        return len(expired)
+
+    async def sweep_sessions(self, interval=SWEEP_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            self.expire_sessions()
+
+    def active_quiz(self, session):
+        if session['quiz'] is None:
+            raise HTTPError(409, "no quiz in progress")
+        return session['quiz']
+
+    async def login(self, body, headers):
+        success, result = await self.run_db(User.login, str(body.get('username', '')), str(body.get('password', '')))
+        if not success:
+            raise HTTPError(401, result)
+        token = secrets.token_urlsafe(24)
+        self.sessions[token] = {'user': result, 'quiz': None, 'type': None, 'seen': self.clock()}
+        return {'token': token, 'username': result.username}
+
+    async def logout(self, body, headers):
+        self.session(headers)
+        del self.sessions[self.token(headers)]
+        return {'logged_out': True}
+
+    async def start_quiz(self, body, headers):
+        session = self.session(headers)
+        quiz_type = body.get('type')
+        if quiz_type not in ('single', 'multiple', 'open'):
+            raise HTTPError(400, "type must be single, multiple or open")
+        length = body.get('length', QUIZ_LENGTH)
+        if not isinstance(length, int) or isinstance(length, bool) or length < 1:
+            raise HTTPError(400, "length must be a positive integer")
+        questions = await self.run_db(question_cache.sample, quiz_type, length)
+        if not questions:
+            raise HTTPError(404, "no questions available for this type")
+        session['quiz'] = Quiz(questions, user=session['user'], quiz_type=quiz_type)
+        session['type'] = quiz_type
+        return {'question': public_question(session['quiz'])}
+
+    async def question(self, body, headers):
+        quiz = self.active_quiz(self.session(headers))
+        q = public_question(quiz)
+        return {'question': q} if q else {'finished': True}
+
+    async def answer(self, body, headers):
+        quiz = self.active_quiz(self.session(headers))
+        if public_question(quiz) is None:
+            raise HTTPError(409, "quiz already finished")
+        answer = body.get('answer')
+        question_type = quiz.questions[quiz.current_question]['type']
+        if not valid_answer(question_type, answer):
+            raise HTTPError(400, "answer must be a list of strings" if question_type == 'multiple' else "answer must be a string")
+        result = quiz.grade_answer(answer)
+        quiz.record('correct' if result.correct else 'incorrect')
+        quiz.next_question()
+        q = public_question(quiz)
+        reply = {'correct': result.correct, 'matched': result.matched}
+        reply.update({'question': q} if q else {'finished': True})
+        return reply
+
+    async def lifeline(self, body, headers):
+        quiz = self.active_quiz(self.session(headers))
+        name = body.get('lifeline')
+        if name not in quiz.lifelines:
+            raise HTTPError(400, "lifeline must be fifty_fifty, hint or skip")
+        if not quiz.lifelines[name]:
+            raise HTTPError(409, f"{name} already used")
+        if public_question(quiz) is None:
+            raise HTTPError(409, "quiz already finished")
+        quiz.lifelines[name] = False
+        quiz.used_lifelines.append(name)
+        if name == 'fifty_fifty':
+            return {'options': quiz.use_fifty_fifty()}
+        if name == 'hint':
+            return {'hint': quiz.use_hint()}
+        quiz.use_skip()
+        q = public_question(quiz)
+        return {'question': q} if q else {'finished': True}
+
+    async def finish(self, body, headers):
+        session = self.session(headers)
+        quiz = self.active_quiz(session)
+        # Claim the quiz before awaiting, so a concurrent /quiz/finish gets 409 instead of recording it again
+        session['quiz'] = None
+        try:
+            summary = await self.run_db(quiz.finish)
+        except Exception:
+            if session['quiz'] is None:
+                session['quiz'] = quiz
+            raise
+        return {'points': quiz.points, 'total': len(quiz.questions), 'stats': summary['stats'],
+                'achievements': [{'name': name, 'description': description} for name, description in summary['achievements']]}
+
+    async def dispatch(self, method, path, headers, body):
+        handler = self.routes.get((method, urlsplit(path).path))
+        if handler is None:
+            raise HTTPError(404, f"no route for {method} {path}")
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            raise HTTPError(400, "body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        return await handler(data, headers)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                # Without a usable Content-Length the next request cannot be found: answer, then close
+                framed = True
+                try:
+                    length = headers.get('content-length') or '0'
+                    if not length.isdigit():
+                        framed = False
+                        raise HTTPError(400, "invalid Content-Length")
+                    length = int(length)
+                    if length > MAX_BODY:
+                        framed = False
+                        raise HTTPError(413, "request body too large")
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = 200, await self.dispatch(method, path, headers, body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    log_error(f"Quiz service error in {method} {path}: {e!r}")
+                    status, payload = 500, {'error': "internal server error"}
+                data = json.dumps(payload).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close' and framed
+                writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        self.sweeper = asyncio.get_running_loop().create_task(self.sweep_sessions())
+        return await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+
+    def close(self):
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+        self.executor.shutdown(wait=True)
+        database.close_connection()
+
+
+async def _main(args):
+    database.DB_FILE = args.db
+    service = QuizService()
+
+    def setup():
+        conn = database.create_database()
+        database.seed_questions(conn)
+        passwords.load_settings(conn)
+
+    await service.run_db(setup)
+    server = await service.serve(args.host, args.port)
+    print(f"Quiz service listening on http://{args.host}:{args.port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless quiz session service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--db', default=database.DB_FILE)
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
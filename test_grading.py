@@ -0,0 +1,44 @@
+"""
+Grading rules of grading.py.
+
+Run with: python -m pytest -q test_grading.py
+"""
+from grading import MIN_MATCHES, grade, grade_many
+
+OPEN = {'type': 'open', 'answer': "Encapsulation hides internal state behind methods"}
+
+
+def test_open_answer_needs_two_key_terms():
+    assert MIN_MATCHES == 2
+    assert not grade(OPEN, "encapsulation").correct
+    assert grade(OPEN, "Encapsulation hides things").correct
+
+
+def test_reference_with_one_key_term_never_passes():
+    # Only "encapsulation" is longer than three letters: one match is never enough
+    question = {'type': 'open', 'answer': "Encapsulation, in OOP"}
+    result = grade(question, "encapsulation")
+    assert result.matched == ['encapsulation']
+    assert not result.correct
+
+
+def test_key_terms_match_whole_words_and_stems():
+    question = {'type': 'open', 'answer': "Ports support routing"}
+    assert not grade(question, "support").correct  # "port" inside "support" is not a match
+    assert grade(question, "port and routes").correct
+
+
+def test_answers_of_the_wrong_type_are_incorrect():
+    assert not grade({'type': 'multiple', 'answer': ['a']}, 5).correct
+    assert not grade({'type': 'multiple', 'answer': ['a']}, [[1]]).correct
+    assert not grade({'type': 'single', 'answer': 'a'}, ['a']).correct
+    assert not grade(OPEN, 5).correct
+
+
+def test_grade_many_matches_grade_in_input_order():
+    single = {'type': 'single', 'answer': 'Network'}
+    multiple = {'type': 'multiple', 'answer': ['a', 'b']}
+    other = {'type': 'open', 'answer': "Routers forward packets between networks"}
+    pairs = [(OPEN, "encapsulation hides"), (single, "network"), (other, "packets forwarded"),
+             (multiple, ['b', 'a']), (OPEN, "nothing"), (other, 7)]
+    assert grade_many(pairs) == [grade(q, a) for q, a in pairs]
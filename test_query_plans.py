@@ -0,0 +1,16 @@
+"""
+Query-plan regression test: no application query may read a whole table
+unless query_plans.ALLOWED_SCANS says why.
+
+Run with: python -m pytest -q test_query_plans.py
+"""
+import database
+import query_plans
+
+
+def test_no_unexpected_full_scans():
+    db_file = database.DB_FILE
+    try:
+        assert query_plans.check(query_plans.module_paths()) == []
+    finally:
+        database.DB_FILE = db_file
@@ -0,0 +1,135 @@
+"""
+Callback counts of the quiz countdown, on a fake Tk root with a simulated clock.
+
+Run with: python -m pytest -q test_scheduler.py
+"""
+from types import SimpleNamespace
+
+from fake_tk import FakeRoot
+from gui import QuizScreen
+from quiz import Quiz
+from scheduler import TickScheduler
+
+TIME_LIMIT = 45
+
+
+class Stub:
+    """ Accepts any widget call """
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class Messages:
+    def __init__(self):
+        self.lines = []
+
+    def add(self, msg):
+        self.lines.append(msg)
+
+    def clear(self):
+        self.lines = []
+
+
+def quiz_screen(root, questions=5):
+    """ A QuizScreen wired to root's scheduler, with stub widgets (no display needed) """
+    screen = QuizScreen.__new__(QuizScreen)
+    for name in ('timer_label', 'counter_label', 'question_label', 'options', 'answer_entry', 'options_frame',
+                 'fifty_btn', 'hint_btn', 'skip_btn', 'submit_button', 'lifeline_frame', 'prev_btn', 'return_btn',
+                 'review_btn'):
+        setattr(screen, name, Stub())
+    screen.message_log = Messages()
+    screen.scheduler = TickScheduler(root, clock=root.clock)
+    screen.time_limit = TIME_LIMIT
+    screen.time_left = TIME_LIMIT
+    screen.countdown = None
+    screen.saved_quiz = None
+    screen.results_shown = 0
+    screen.show_results = lambda: setattr(screen, 'results_shown', screen.results_shown + 1)
+    screen.quiz = Quiz([{'question': f"Q{i}", 'type': 'open', 'options': [], 'answer': "reference answer"}
+                        for i in range(questions)], quiz_type='open')
+    screen.incorrect_answers = []
+    return screen
+
+
+def test_one_pending_callback_across_navigation():
+    root = FakeRoot()
+    scheduler = TickScheduler(root, clock=root.clock)
+    expired = []
+    countdown = None
+    for _ in range(300):
+        scheduler.cancel(countdown)
+        countdown = scheduler.start(TIME_LIMIT, lambda left: None, lambda: expired.append(1))
+        root.run_until(root.now + 3.5)
+        assert len(root.queue) <= 1
+    # At most one wakeup per second of simulated time, whatever was started and cancelled
+    assert scheduler.wakeups <= int(root.now) + 1
+    scheduler.cancel(countdown)
+    assert not root.queue
+    assert not expired
+
+
+def test_untouched_countdown_expires_once_then_stops():
+    root = FakeRoot()
+    scheduler = TickScheduler(root, clock=root.clock)
+    ticks, expired = [], []
+    scheduler.start(TIME_LIMIT, ticks.append, lambda: expired.append(1))
+    root.run_until(TIME_LIMIT * 3)
+    assert expired == [1]
+    assert not root.queue
+    assert ticks[0] == TIME_LIMIT and ticks[-1] == 0
+    assert scheduler.wakeups == TIME_LIMIT
+
+
+def test_quiz_screen_navigation_keeps_one_countdown():
+    root = FakeRoot()
+    screen = quiz_screen(root)
+    screen.show_question()
+    root.run_until(2.5)
+    screen.answer_entry.get = lambda: "anything"
+    screen.submit_answer()
+    root.run_until(4.5)
+    screen.go_previous()
+    root.run_until(6.5)
+    screen.use_skip()
+    assert len(screen.scheduler.countdowns) == 1
+    assert len(root.queue) == 1
+    # Navigating restarted the countdown: nothing expires before a full time limit on the new question
+    root.run_until(6.5 + TIME_LIMIT - 1)
+    assert not any("Time's up" in line for line in screen.message_log.lines)
+    assert screen.quiz.current_question == 1
+
+
+def test_quiz_screen_time_up_moves_on_once():
+    root = FakeRoot()
+    screen = quiz_screen(root, questions=2)
+    screen.show_question()
+    root.run_until(TIME_LIMIT + 0.5)
+    assert screen.quiz.current_question == 1
+    assert screen.quiz.outcomes == {0: 'timeout'}
+    root.run_until(2 * TIME_LIMIT + 0.5)
+    # Both questions timed out, the results were shown once and the chain stopped
+    assert screen.results_shown == 1
+    assert screen.quiz.outcomes == {0: 'timeout', 1: 'timeout'}
+    assert not root.queue
+    assert screen.scheduler.countdowns == []
+
+
+def test_quiz_screen_hide_and_destroy_cancel_the_countdown():
+    root = FakeRoot()
+    screen = quiz_screen(root)
+    screen.show_question()
+    root.run_until(1.5)
+    screen.on_hide()
+    assert not root.queue
+    scheduled = root.scheduled
+    root.run_until(TIME_LIMIT * 2)
+    assert root.scheduled == scheduled
+    assert screen.quiz.current_question == 0
+
+    screen.show_question()
+    assert len(root.queue) == 1
+    # <Destroy> of a child widget must not stop the quiz timer; only the screen's own does
+    screen.on_destroy(SimpleNamespace(widget=object()))
+    assert len(root.queue) == 1
+    screen.on_destroy(SimpleNamespace(widget=screen))
+    assert not root.queue
@@ -1,110 +1,178 @@
 import sqlite3
-import hashlib
-from database import create_database
+import passwords
+import achievements
+from datetime import datetime
+from database import get_connection
+
+# Columns a User is built from, in constructor order
+USER_COLUMNS = "username, email, password, id"
 
 class User:
-    def __init__(self, username, email, password):
+    """ A logged-in account. Carries the users.id primary key, so per-user queries go straight to user_id """
+    __slots__ = ('id', 'username', 'email', 'password')
+
+    def __init__(self, username, email, password, id=None):
+        self.id = id
         self.username = username
         self.email = email
         self.password = password
-        self.achievements = []
-        self.records = []
 
     def save_to_db(self):
-        conn = create_database()
+        conn = get_connection()
         c = conn.cursor()
         c.execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
                   (self.username, self.email, self.password))
         conn.commit()
-        conn.close()
+        self.id = c.lastrowid
 
     @staticmethod
     def hash_password(password):
-        return hashlib.sha256(password.encode('utf-8')).hexdigest()
+        return passwords.hash_password(password)
 
     @staticmethod
     def register(username, email, password):
-        conn = create_database()
+        conn = get_connection()
         c = conn.cursor()
-        c.execute("SELECT * FROM users WHERE username=? OR email=?", (username, email))
+        c.execute("SELECT 1 FROM users WHERE username=? OR email=?", (username, email))
         if c.fetchone():
-            conn.close()
             return False, "Username or email already exists."
         hashed = User.hash_password(password)
-        c.execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)", (username, email, hashed))
+        try:
+            c.execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)", (username, email, hashed))
+        except sqlite3.IntegrityError:
+            # Registered by a concurrent request since the check above
+            conn.rollback()
+            return False, "Username or email already exists."
         conn.commit()
-        conn.close()
         return True, "Registration successful."
 
     @staticmethod
     def login(username, password):
-        conn = create_database()
+        conn = get_connection()
         c = conn.cursor()
-        hashed = User.hash_password(password)
-        c.execute("SELECT * FROM users WHERE username=? AND password=?", (username, hashed))
+        c.execute(f"SELECT {USER_COLUMNS} FROM users WHERE username=?", (username,))
         row = c.fetchone()
-        conn.close()
-        if row:
-            return True, User(row[1], row[2], row[3])
-        else:
+        if row is None:
+            # Same work as a real check, so the response time does not tell which usernames exist
+            passwords.hash_password(password)
             return False, "Invalid username or password."
+        if not passwords.verify_password(password, row[2]):
+            return False, "Invalid username or password."
+        user = User(*row)
+        if passwords.needs_rehash(user.password):
+            # Upgrade legacy SHA-256 or outdated hashes while the plain password is at hand
+            user.password = passwords.hash_password(password)
+            c.execute("UPDATE users SET password=? WHERE id=? AND password=?", (user.password, user.id, row[2]))
+            conn.commit()
+        return True, user
 
     @staticmethod
     def get_user(username):
-        conn = create_database()
+        conn = get_connection()
         c = conn.cursor()
-        c.execute("SELECT * FROM users WHERE username=?", (username,))
+        c.execute(f"SELECT {USER_COLUMNS} FROM users WHERE username=?", (username,))
         row = c.fetchone()
-        conn.close()
         if row:
-            return User(row[1], row[2], row[3])
+            return User(*row)
         return None
 
     def get_achievements(self):
-        conn = create_database()
+        conn = get_connection()
         c = conn.cursor()
-        c.execute("SELECT name, description, date FROM achievements WHERE user_id=(SELECT id FROM users WHERE username=?)", (self.username,))
-        self.achievements = c.fetchall()
-        conn.close()
-        return self.achievements
+        c.execute("SELECT name, description, date FROM achievements WHERE user_id=?", (self.id,))
+        return c.fetchall()
 
     def get_records(self):
-        conn = create_database()
+        conn = get_connection()
         c = conn.cursor()
-        c.execute("SELECT type, points, date FROM results WHERE user_id=(SELECT id FROM users WHERE username=?) ORDER BY points DESC", (self.username,))
-        self.records = c.fetchall()
-        conn.close()
-        return self.records
+        c.execute("SELECT type, points, date FROM results WHERE user_id=? ORDER BY points DESC", (self.id,))
+        return c.fetchall()
 
     def has_achievement(self, name):
-        conn = create_database()
+        conn = get_connection()
         c = conn.cursor()
-        c.execute("SELECT 1 FROM achievements WHERE user_id=(SELECT id FROM users WHERE username=?) AND name=?", (self.username, name))
+        c.execute("SELECT 1 FROM achievements WHERE user_id=? AND name=?", (self.id, name))
         result = c.fetchone()
-        conn.close()
         return result is not None
 
     def get_stats(self):
-        conn = create_database()
+        conn = get_connection()
+        c = conn.cursor()
+        c.execute("SELECT quizzes, best, total_points, last_played FROM user_stats WHERE user_id=?", (self.id,))
+        row = c.fetchone()
+        if row is None:
+            return {'quizzes': 0, 'best': 0, 'avg': 0.0, 'last_played': None}
+        count, best, total, last_played = row
+        return {'quizzes': count, 'best': best, 'avg': round(total / count, 2), 'last_played': last_played}
+
+    def get_type_stats(self):
+        """ Per quiz type breakdown: {type: {'quizzes', 'best', 'avg'}} """
+        conn = get_connection()
         c = conn.cursor()
-        c.execute("SELECT COUNT(*), MAX(points), AVG(points) FROM results WHERE user_id=(SELECT id FROM users WHERE username=?)", (self.username,))
-        count, best, avg = c.fetchone()
-        conn.close()
-        return {'quizzes': count or 0, 'best': best or 0, 'avg': round(avg, 2) if avg else 0.0}
+        c.execute("SELECT type, quizzes, best, total_points FROM user_type_stats WHERE user_id=?", (self.id,))
+        return {t: {'quizzes': n, 'best': best, 'avg': round(total / n, 2)} for t, n, best, total in c.fetchall()}
 
     @staticmethod
-    def get_ranking():
-        conn = create_database()
+    def get_ranking(limit=10, offset=0):
+        """ [(username, total_points)] in rank order: most points first, ties by user id (as get_rank counts them) """
+        conn = get_connection()
         c = conn.cursor()
-        c.execute("SELECT u.username, SUM(r.points) as total FROM users u JOIN results r ON u.id = r.user_id GROUP BY u.username ORDER BY total DESC LIMIT 10")
+        c.execute("SELECT u.username, l.total_points FROM leaderboard l JOIN users u ON u.id = l.user_id ORDER BY l.total_points DESC, l.user_id LIMIT ? OFFSET ?", (limit, offset))
         ranking = c.fetchall()
-        conn.close()
         return ranking
 
+    def get_rank(self):
+        """ Return (rank, total_points) for this user, or None if they have no results yet.
+
+        The rank is the user's position in get_ranking() (ties ordered by
+        user id), counted over the leaderboard index entries ahead of them:
+        a range count costs O(rank), not O(log n), which is fine for
+        leaderboards of classroom size.
+        """
+        conn = get_connection()
+        c = conn.cursor()
+        c.execute("SELECT total_points FROM leaderboard WHERE user_id=?", (self.id,))
+        row = c.fetchone()
+        if row is None:
+            return None
+        c.execute("SELECT (SELECT COUNT(*) FROM leaderboard WHERE total_points > ?1) "
+                  "+ (SELECT COUNT(*) FROM leaderboard WHERE total_points = ?1 AND user_id < ?2)", (row[0], self.id))
+        return c.fetchone()[0] + 1, row[0]
+
     def grant_achievement(self, name, description):
-        if not self.has_achievement(name):
-            conn = create_database()
-            c = conn.cursor()
-            c.execute("INSERT INTO achievements (user_id, name, description, date) VALUES ((SELECT id FROM users WHERE username=?), ?, ?, datetime('now'))", (self.username, name, description))
+        # UNIQUE (user_id, name) makes a repeated grant a no-op
+        conn = get_connection()
+        c = conn.cursor()
+        c.execute("INSERT OR IGNORE INTO achievements (user_id, name, description, date) VALUES (?, ?, ?, datetime('now'))", (self.id, name, description))
+        conn.commit()
+
+    def save_result(self, quiz_type, points):
+        """ Record a score without per-question detail; returns [(name, description)] of the achievements granted """
+        return self.finish_quiz(quiz_type, points)['achievements']
+
+    def finish_quiz(self, quiz_type, points, answers=(), total=None):
+        """ Record a finished quiz in one transaction and return everything the results view shows.
+
+        The result, its per-question outcomes (answers: (position, question
+        id, outcome) rows, see Quiz.answer_rows), the aggregate updates (by
+        the results triggers) and the achievement grants commit together;
+        the returned stats are read inside the same transaction, so they
+        include this quiz. Returns a dict with result_id, points, total,
+        stats, type_stats, rank and achievements.
+        """
+        conn = get_connection()
+        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        total = total if total is not None else len(answers)
+        if conn.in_transaction:
+            # Left open on this thread's shared connection by an earlier statement; BEGIN would fail
             conn.commit()
-            conn.close() 
\ No newline at end of file
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            result_id = conn.execute("INSERT INTO results (user_id, type, points, date) VALUES (?, ?, ?, ?)",
+                                     (self.id, quiz_type, points, date)).lastrowid
+            conn.executemany("INSERT INTO quiz_answers (result_id, position, question_id, outcome) VALUES (?, ?, ?, ?)",
+                             [(result_id,) + tuple(row) for row in answers])
+            granted = achievements.evaluate(conn, self.id, quiz_type, points, date, total)
+            return {'result_id': result_id, 'points': points, 'total': total,
+                    'stats': self.get_stats(), 'type_stats': self.get_type_stats().get(quiz_type),
+                    'rank': self.get_rank(), 'achievements': granted}